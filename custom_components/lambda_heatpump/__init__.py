@@ -1,26 +1,236 @@
 """Initialize the Lambda Heatpump integration."""
+import logging
+import time
+
+import voluptuous as vol
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import ATTR_ENTITY_ID, CONF_IP_ADDRESS, EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse, callback
+from homeassistant.exceptions import ConfigEntryError, ServiceValidationError
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    CONF_MODULES,
+    CONF_PROXY_HOST,
+    CONF_PROXY_MAX_AGE,
+    CONF_PROXY_PORT,
+    CONF_REGISTER_MAP,
+    DATA_CONNECTIONS,
+    DOMAIN,
+)
+from .lambda_heatpump_api import (
+    DEFAULT_PROXY_HOST,
+    DEFAULT_PROXY_MAX_AGE,
+    DEFAULT_PROXY_PORT,
+    ConnectionPool,
+    encode_value,
+)
+from .register_map import DEFAULT_REGISTER_MAP, load_register_map
+
+_LOGGER = logging.getLogger(__name__)
+
+LEGACY_UNIQUE_ID_PREFIX = "lambda_heatpump_"
+WRITE_PLATFORMS = ["number", "select"]
+
+# Letzte Messwerte je Eintrag, damit Entitäten nach einem Neustart sofort einen Zustand haben
+SNAPSHOT_STORAGE_VERSION = 1
+
+SERVICE_EXPORT_SAMPLES = "export_samples"
+ATTR_SECONDS = "seconds"
+EXPORT_SAMPLES_SCHEMA = vol.Schema({
+    vol.Required(ATTR_ENTITY_ID): cv.entity_id,
+    vol.Optional(ATTR_SECONDS): vol.All(vol.Coerce(int), vol.Range(min=1)),
+})
+
+SERVICE_WRITE_REGISTER = "write_register"
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_REGISTER = "register"
+ATTR_VALUE = "value"
+WRITE_REGISTER_SCHEMA = vol.Schema({
+    vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+    vol.Required(ATTR_REGISTER): vol.All(vol.Coerce(int), vol.Range(min=0, max=0xFFFF)),
+    vol.Required(ATTR_VALUE): vol.Coerce(float),
+})
 
-DOMAIN = "lambda_heatpump"
+@callback
+def async_get_connection_pool(hass: HomeAssistant) -> ConnectionPool:
+    """Return the connection pool shared by all Lambda Heatpump entries."""
+    pool = hass.data.get(DATA_CONNECTIONS)
+    if pool is None:
+        pool = hass.data[DATA_CONNECTIONS] = ConnectionPool()
+        # Verbindungen, die beim Beenden noch offen sind, sauber schließen
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, lambda event: pool.close())
+    return pool
+
+@callback
+def snapshot_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Return the store holding the last polled values of a config entry."""
+    return Store(hass, SNAPSHOT_STORAGE_VERSION, f"{DOMAIN}.{entry_id}")
 
 async def async_setup(hass: HomeAssistant, config: dict):
     """Set up the Lambda Heatpump integration."""
     hass.data.setdefault(DOMAIN, {})
+
+    async def async_export_samples(call: ServiceCall):
+        """Return the buffered high-rate samples of a sampled sensor."""
+        entity_id = call.data[ATTR_ENTITY_ID]
+        entity_entry = er.async_get(hass).async_get(entity_id)
+        runtime = hass.data[DOMAIN].get(entity_entry.config_entry_id, {}) if entity_entry else {}
+        name = runtime.get("sampled_sensors", {}).get(entity_entry.unique_id) if entity_entry else None
+        if name is None:
+            raise ServiceValidationError(f"{entity_id} is not sampled at a high rate")
+        since = time.time() - call.data[ATTR_SECONDS] if ATTR_SECONDS in call.data else None
+        return {
+            "entity_id": entity_id,
+            "interval": runtime["sampler"].interval,
+            "samples": [[timestamp, value] for timestamp, value in runtime["sampler"].export(name, since)],
+        }
+
+    async def async_write_register(call: ServiceCall):
+        """Queue a write of a writable register in sensor units (option index for modes)."""
+        runtime = hass.data[DOMAIN].get(call.data[ATTR_CONFIG_ENTRY_ID], {})
+        if "write_queue" not in runtime:
+            raise ServiceValidationError(f"Config entry {call.data[ATTR_CONFIG_ENTRY_ID]} is not loaded")
+        register = call.data[ATTR_REGISTER]
+        value = call.data[ATTR_VALUE]
+        sensor = next(
+            (sensor for sensor in runtime["sensors"] if sensor["register"] == register and "write" in sensor), None
+        )
+        if sensor is None:
+            raise ServiceValidationError(f"Register {register} is not writable")
+        if sensor.get("description_map"):
+            low, high = 0, len(sensor["description_map"]) - 1
+        else:
+            low, high = sensor["write"]["min"], sensor["write"]["max"]
+        if not low <= value <= high:
+            raise ServiceValidationError(f"{value} is outside {low}..{high} for {sensor['name']}")
+        runtime["write_queue"].write(register, encode_value(sensor, value))
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_EXPORT_SAMPLES,
+        async_export_samples,
+        schema=EXPORT_SAMPLES_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
+    hass.services.async_register(DOMAIN, SERVICE_WRITE_REGISTER, async_write_register, schema=WRITE_REGISTER_SCHEMA)
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Set up Lambda Heatpump from a config entry."""
     hass.data.setdefault(DOMAIN, {})
-    hass.data[DOMAIN][entry.entry_id] = entry.data
+    # Laufzeitobjekte (Client, Coordinator) werden von den Plattformen ergänzt
+    hass.data[DOMAIN][entry.entry_id] = {"config": entry.data}
+
+    # Registerkarte des Modells; sie wird einmal je Prozess gelesen und von allen Einträgen geteilt
+    try:
+        register_map = await hass.async_add_executor_job(
+            load_register_map, entry.data.get(CONF_REGISTER_MAP, DEFAULT_REGISTER_MAP)
+        )
+    except (OSError, ValueError) as e:
+        raise ConfigEntryError(f"Could not load the register map: {e}") from e
+    hass.data[DOMAIN][entry.entry_id]["register_map"] = register_map
+
+    # Eine Modbus-Sitzung je Steuerung; sie wird geschlossen, wenn der letzte Eintrag entladen ist
+    pool = async_get_connection_pool(hass)
+    connection = pool.acquire(entry.data[CONF_IP_ADDRESS])
+    entry.async_on_unload(lambda: pool.release(connection))
+    hass.data[DOMAIN][entry.entry_id]["connection"] = connection
 
-    # Korrekte Methode verwenden, um Plattformen zu registrieren
+    # Korrekte Methode verwenden, um Plattformen zu registrieren; die Sensor-Plattform legt
+    # Coordinator und Schreibwarteschlange an, die Number/Select danach verwenden
     await hass.config_entries.async_forward_entry_setups(entry, ["sensor"])
+    await hass.config_entries.async_forward_entry_setups(entry, WRITE_PLATFORMS)
+
+    # Der Proxy schreibt über die Schreibwarteschlange der Sensor-Plattform
+    proxy_port = entry.data.get(CONF_PROXY_PORT, DEFAULT_PROXY_PORT)
+    if proxy_port:
+        await async_start_proxy(hass, entry, connection, proxy_port)
+
+    # Nach einem Modul-Rescan (Optionen) den Eintrag neu laden
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+    return True
+
+async def async_start_proxy(hass: HomeAssistant, entry: ConfigEntry, connection, port):
+    """Start the local Modbus proxy for a config entry."""
+    # pymodbus' Server nur laden, wenn der Proxy auch genutzt wird
+    from .proxy import LambdaModbusProxy
+
+    runtime = hass.data[DOMAIN][entry.entry_id]
+    if "write_queue" not in runtime:
+        _LOGGER.error("Not starting the Lambda Modbus proxy: the sensor platform is not set up")
+        return
+    host = entry.data.get(CONF_PROXY_HOST, DEFAULT_PROXY_HOST)
+    proxy = LambdaModbusProxy(
+        connection,
+        runtime["write_queue"],
+        port,
+        host=host,
+        max_age=entry.data.get(CONF_PROXY_MAX_AGE, DEFAULT_PROXY_MAX_AGE),
+    )
+    try:
+        await proxy.async_start()
+    except (RuntimeError, OSError) as e:
+        # Ein belegter Port soll die Integration selbst nicht verhindern
+        _LOGGER.error("Could not start the Lambda Modbus proxy on %s:%s: %s", host, port, e)
+        return
+    entry.async_on_unload(proxy.shutdown)
+    runtime["proxy"] = proxy
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Reload a config entry after its data or options changed."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+async def async_migrate_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Migrate a config entry to the current version."""
+    if entry.version == 1:
+        # Version 2: Unique IDs und Geräte je Eintrag, Modultopologie statt Heizkreis-Flags
+        @callback
+        def migrate_unique_id(entity_entry):
+            if not entity_entry.unique_id.startswith(LEGACY_UNIQUE_ID_PREFIX):
+                return None
+            suffix = entity_entry.unique_id[len(LEGACY_UNIQUE_ID_PREFIX):]
+            return {"new_unique_id": f"{entry.entry_id}_{suffix}"}
+
+        await er.async_migrate_entries(hass, entry.entry_id, migrate_unique_id)
+
+        device_registry = dr.async_get(hass)
+        for device in dr.async_entries_for_config_entry(device_registry, entry.entry_id):
+            identifiers = {
+                (domain, f"{entry.entry_id}_{identifier}") if domain == DOMAIN else (domain, identifier)
+                for domain, identifier in device.identifiers
+            }
+            device_registry.async_update_device(device.id, new_identifiers=identifiers)
+
+        data = dict(entry.data)
+        if CONF_MODULES not in data:
+            heating_circuits = [1]
+            if data.pop("has_heat_circuit_2", True):
+                heating_circuits.append(2)
+            if data.pop("has_heat_circuit_3", True):
+                heating_circuits.append(3)
+            data[CONF_MODULES] = {
+                "heat_pump": [1],
+                "boiler": [1],
+                "buffer": [1],
+                "solar": [],
+                "heating_circuit": heating_circuits,
+            }
+        hass.config_entries.async_update_entry(entry, data=data, version=2)
+        _LOGGER.info("Migrated Lambda Heatpump entry %s to version 2", entry.entry_id)
+
     return True
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Remove the stored snapshot of a deleted config entry."""
+    await snapshot_store(hass, entry.entry_id).async_remove()
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Unload a config entry."""
-    unload_ok = await hass.config_entries.async_unload_platforms(entry, ["sensor"])
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, ["sensor", *WRITE_PLATFORMS])
     if unload_ok:
         hass.data[DOMAIN].pop(entry.entry_id)
     return unload_ok
\ No newline at end of file
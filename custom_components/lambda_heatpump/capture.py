@@ -0,0 +1,296 @@
+"""Raw register capture log and offline replay.
+
+A capture file starts with a header (magic, format version, length of a
+JSON metadata blob, the blob) followed by one record per block response:
+
+    timestamp (float64), first register (uint16), count (uint16), registers (uint16 each)
+
+All numbers are little-endian. Records are only ever appended, so a file
+can be memory-mapped and replayed while it is still written; a truncated
+last record is ignored by the reader and cut off before the writer
+appends to the file again.
+"""
+from array import array
+from collections import deque
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+
+from .lambda_heatpump_api import (
+    DEFAULT_CAPTURE_BACKUPS,
+    DEFAULT_CAPTURE_MAX_SIZE,
+    BlockDecoder,
+    sensor_register_span,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+CAPTURE_MAGIC = b"LAMBDCAP"
+CAPTURE_VERSION = 1
+_HEADER = struct.Struct("<8sHI")
+_RECORD = struct.Struct("<dHH")
+# Register liegen in der Datei little-endian, BlockDecoder erwartet native Byte-Reihenfolge
+_NATIVE_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def _complete_size(path):
+    """Return the size of a capture file up to its last complete record, or None if it has another format."""
+    with open(path, "rb") as file:
+        header = file.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return None
+        magic, version, length = _HEADER.unpack(header)
+        if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+            return None
+        size = os.fstat(file.fileno()).st_size
+        offset = _HEADER.size + length
+        if offset > size:
+            return None
+        # Nur die Satzköpfe lesen und über die Registerwerte springen
+        while offset + _RECORD.size <= size:
+            file.seek(offset)
+            _, _, count = _RECORD.unpack(file.read(_RECORD.size))
+            if offset + _RECORD.size + 2 * count > size:
+                break
+            offset += _RECORD.size + 2 * count
+        return offset
+
+
+class CaptureWriter:
+    """Append raw block responses to a rotating capture log.
+
+    ``append`` only queues a record in memory and is cheap enough for the
+    poll cycle; ``flush`` and ``close`` do blocking file I/O. Once a file
+    would exceed ``max_size`` MiB it is renamed to ``<path>.1`` (older
+    files move up to ``<path>.<backups>``) and a new file is started.
+    """
+
+    def __init__(self, path, metadata=None, max_size=DEFAULT_CAPTURE_MAX_SIZE, backups=DEFAULT_CAPTURE_BACKUPS):
+        self.path = path
+        self.metadata = dict(metadata or {})
+        self.max_bytes = max_size * 1024 * 1024
+        self.backups = backups
+        self.records = 0
+        self.bytes_written = 0
+        self.rotations = 0
+        self.dropped = 0
+        # deque: append im Event-Loop und popleft im Executor ohne weitere Sperre; jeder Zähler
+        # hat nur einen schreibenden Thread, der Rückstand ist ihre Differenz
+        self._pending = deque()
+        self._queued_bytes = 0
+        self._flushed_bytes = 0
+        self._file = None
+        self._size = 0
+        # flush und close können beim Entladen gleichzeitig in zwei Executor-Threads laufen
+        self._file_lock = threading.Lock()
+
+    def append(self, timestamp, start, registers):
+        """Queue the raw registers of one block response."""
+        if self._queued_bytes - self._flushed_bytes >= self.max_bytes:
+            # Schreiben hängt (z. B. Datenträger voll): Speicherbedarf begrenzen
+            self.dropped += 1
+            return
+        words = array("H", registers)
+        if not _NATIVE_LITTLE_ENDIAN:
+            words.byteswap()
+        record = _RECORD.pack(timestamp, start, len(words)) + words.tobytes()
+        self._pending.append(record)
+        self._queued_bytes += len(record)
+        self.records += 1
+
+    def _header(self):
+        metadata = json.dumps({**self.metadata, "created": time.time()}).encode()
+        return _HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, len(metadata)) + metadata
+
+    def _open(self):
+        """Open the capture file, starting a new one if the existing file has another format.
+
+        A record cut off by a crash or a full disk is truncated, otherwise
+        the records appended after it could not be read.
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            complete = _complete_size(self.path)
+            if complete is None:
+                self._rotate()
+                return
+            if complete < os.path.getsize(self.path):
+                _LOGGER.warning("Truncating an incomplete record at the end of the register capture %s", self.path)
+                os.truncate(self.path, complete)
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+        if not self._size:
+            self._write(self._header())
+
+    def _write(self, data):
+        self._file.write(data)
+        self._size += len(data)
+        self.bytes_written += len(data)
+
+    def _rotate(self):
+        """Move the current file to ``<path>.1`` and start a new one."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.backups:
+            for index in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{index}"):
+                    os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+        self._file = open(self.path, "ab")
+        self._size = 0
+        self._write(self._header())
+
+    def flush(self):
+        """Write the queued records to disk."""
+        with self._file_lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        try:
+            if self._file is None:
+                self._open()
+            while self._pending:
+                record = self._pending.popleft()
+                self._flushed_bytes += len(record)
+                if self._size + len(record) > self.max_bytes and self._size > _HEADER.size:
+                    self._rotate()
+                self._write(record)
+            self._file.flush()
+        except OSError as e:
+            _LOGGER.error("Could not write the register capture %s: %s", self.path, e)
+            while self._pending:
+                self._flushed_bytes += len(self._pending.popleft())
+                self.dropped += 1
+
+    def close(self):
+        """Write the queued records and close the file."""
+        with self._file_lock:
+            self._flush()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def as_dict(self):
+        """Return the capture statistics for diagnostics."""
+        return {
+            "path": self.path,
+            "records": self.records,
+            "bytes_written": self.bytes_written,
+            "rotations": self.rotations,
+            "dropped": self.dropped,
+            "pending": len(self._pending),
+        }
+
+
+class CaptureReader:
+    """Memory-mapped reader of one capture file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, length = _HEADER.unpack_from(self._mmap, 0)
+            if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+                raise ValueError
+            self.metadata = json.loads(self._mmap[_HEADER.size:_HEADER.size + length])
+        except (struct.error, ValueError):
+            self._mmap.close()
+            raise ValueError(f"{path} is not a version {CAPTURE_VERSION} register capture") from None
+        self._data_offset = _HEADER.size + length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def buffer(self):
+        """Return the mapped file contents."""
+        return self._mmap
+
+    def records(self):
+        """Yield (timestamp, first register, count, offset of the registers) for every complete record."""
+        buffer = self._mmap
+        size = len(buffer)
+        offset = self._data_offset
+        record_size = _RECORD.size
+        unpack_from = _RECORD.unpack_from
+        while offset + record_size <= size:
+            timestamp, start, count = unpack_from(buffer, offset)
+            offset += record_size
+            if offset + 2 * count > size:
+                break
+            yield timestamp, start, count, offset
+            offset += 2 * count
+
+    def registers(self, offset, count):
+        """Return the registers of a record as an array of ints."""
+        words = array("H", self._mmap[offset:offset + 2 * count])
+        if not _NATIVE_LITTLE_ENDIAN:
+            words.byteswap()
+        return words
+
+    def close(self):
+        """Unmap the file."""
+        self._mmap.close()
+
+
+class CaptureReplay:
+    """Decode captured block responses with the integration's BlockDecoder.
+
+    A decoder is compiled once per distinct captured block for the
+    sensors that lie completely inside it, so captures taken with other
+    read plans or register gaps replay as well.
+    """
+
+    def __init__(self, sensors):
+        self.sensors = sorted(sensors, key=sensor_register_span)
+        self._decoders = {}
+
+    @property
+    def blocks(self):
+        """Return (first register, count) of every block replayed so far."""
+        return list(self._decoders)
+
+    def decoder(self, start, count):
+        """Return the (cached) decoder of a captured block."""
+        key = (start, count)
+        decoder = self._decoders.get(key)
+        if decoder is None:
+            end = start + count - 1
+            members = [
+                sensor for sensor in self.sensors
+                if start <= sensor_register_span(sensor)[0] and sensor_register_span(sensor)[1] <= end
+            ]
+            decoder = self._decoders[key] = BlockDecoder(start, end, members)
+        return decoder
+
+    def replay(self, reader, data=None):
+        """Decode all records of a capture as fast as possible.
+
+        Yields (timestamp, names of the decoded sensors, data) per record.
+        ``data`` is one dict updated in place with the latest value of
+        every sensor, like the coordinator data during polling.
+        """
+        data = {} if data is None else data
+        buffer = reader.buffer
+        for timestamp, start, count, offset in reader.records():
+            decoder = self.decoder(start, count)
+            if _NATIVE_LITTLE_ENDIAN:
+                decoder.decode_buffer(buffer, data, offset)
+            else:
+                decoder.decode(reader.registers(offset, count), data)
+            yield timestamp, decoder.names, data
@@ -2,41 +2,191 @@
 import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.const import CONF_IP_ADDRESS
+from homeassistant.core import callback
 import homeassistant.helpers.config_validation as cv
 
-DOMAIN = "lambda_heatpump"
+from . import async_get_connection_pool
+from .const import (
+    CONF_CAPTURE,
+    CONF_CAPTURE_MAX_SIZE,
+    CONF_FAST_UPDATE_INTERVAL,
+    CONF_HEARTBEAT,
+    CONF_MAX_REGISTER_GAP,
+    CONF_MAX_VALUE_AGE,
+    CONF_MODULES,
+    CONF_PROXY_HOST,
+    CONF_PROXY_MAX_AGE,
+    CONF_PROXY_PORT,
+    CONF_REGISTER_MAP,
+    CONF_RELATIVE_DEADBAND,
+    CONF_SAMPLED_SENSORS,
+    CONF_SAMPLING_INTERVAL,
+    CONF_SLOW_UPDATE_INTERVAL,
+    CONF_TEMPERATURE_DEADBAND,
+    CONF_UPDATE_INTERVAL,
+    DOMAIN,
+)
+from .lambda_heatpump_api import (
+    DEFAULT_CAPTURE_MAX_SIZE,
+    DEFAULT_HEARTBEAT,
+    DEFAULT_MAX_REGISTER_GAP,
+    DEFAULT_MAX_VALUE_AGE,
+    DEFAULT_POLL_INTERVALS,
+    DEFAULT_PROXY_HOST,
+    DEFAULT_PROXY_MAX_AGE,
+    DEFAULT_PROXY_PORT,
+    DEFAULT_SAMPLING_INTERVAL,
+    MAX_REGISTERS_PER_READ,
+    POLL_TIER_FAST,
+    POLL_TIER_SLOW,
+    discover_modules,
+)
+from .register_map import DEFAULT_REGISTER_MAP, available_register_maps, load_register_map
+from .sensor import (
+    DEFAULT_MODULES,
+    DEFAULT_RELATIVE_DEADBAND,
+    DEFAULT_TEMPERATURE_DEADBAND,
+    expand_sensors,
+    sampling_candidates,
+)
+
+
+async def _async_discover_modules(hass, ip_address):
+    """Run the module discovery over the shared connection to a controller."""
+    pool = async_get_connection_pool(hass)
+    connection = pool.acquire(ip_address)
+    try:
+        return await discover_modules(connection)
+    finally:
+        pool.release(connection)
+
+
+def _describe_modules(modules):
+    """Return a short human readable summary of a discovered topology."""
+    return ", ".join(
+        f"{module.replace('_', ' ')}: {', '.join(map(str, indexes))}"
+        for module, indexes in modules.items()
+        if indexes
+    ) or "-"
 
 class LambdaHeatpumpConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Lambda Heatpump."""
 
+    VERSION = 2
+
     async def async_step_user(self, user_input=None):
         """Handle the initial step."""
         errors = {}
 
         if user_input is not None:
-            # Validierung der Eingaben
-            try:
-                ip_address = user_input[CONF_IP_ADDRESS]
-                update_interval = user_input["update_interval"]
-
-                # Beispiel: Verbindung testen (optional)
-                # Hier könnte ein Test der Verbindung zur Wärmepumpe erfolgen
+            ip_address = user_input[CONF_IP_ADDRESS]
 
+            # Verbindung testen und vorhandene Module (Wärmepumpen, Speicher, Heizkreise) ermitteln
+            modules = await _async_discover_modules(self.hass, ip_address)
+            if modules is None:
+                errors["base"] = "cannot_connect"
+            else:
                 return self.async_create_entry(
                     title=f"Lambda Heatpump ({ip_address})",
-                    data=user_input
+                    data={**user_input, CONF_MODULES: modules},
                 )
-            except Exception:  # Fange alle Fehler ab, z. B. Verbindungsprobleme
-                errors["base"] = "cannot_connect"
 
         # Zeige das Formular zur Eingabe der IP-Adresse und des Intervalls
+        register_maps = await self.hass.async_add_executor_job(available_register_maps)
         return self.async_show_form(
             step_id="user",
             data_schema=vol.Schema({
                 vol.Required(CONF_IP_ADDRESS): cv.string,
-                vol.Optional("update_interval", default=30): vol.All(vol.Coerce(int), vol.Range(min=10, max=3600)),
-                vol.Optional("has_heat_circuit_2", default=True): cv.boolean,
-                vol.Optional("has_heat_circuit_3", default=True): cv.boolean,
+                vol.Optional(CONF_REGISTER_MAP, default=DEFAULT_REGISTER_MAP): vol.In(register_maps),
+                vol.Optional(CONF_UPDATE_INTERVAL, default=30): vol.All(vol.Coerce(int), vol.Range(min=10, max=3600)),
+                vol.Optional(CONF_FAST_UPDATE_INTERVAL, default=DEFAULT_POLL_INTERVALS[POLL_TIER_FAST]): vol.All(
+                    vol.Coerce(int), vol.Range(min=1, max=3600)
+                ),
+                vol.Optional(CONF_SLOW_UPDATE_INTERVAL, default=DEFAULT_POLL_INTERVALS[POLL_TIER_SLOW]): vol.All(
+                    vol.Coerce(int), vol.Range(min=10, max=86400)
+                ),
+                vol.Optional(CONF_MAX_REGISTER_GAP, default=DEFAULT_MAX_REGISTER_GAP): vol.All(
+                    vol.Coerce(int), vol.Range(min=0, max=MAX_REGISTERS_PER_READ)
+                ),
+                vol.Optional(CONF_MAX_VALUE_AGE, default=DEFAULT_MAX_VALUE_AGE): vol.All(
+                    vol.Coerce(int), vol.Range(min=0, max=86400)
+                ),
+                vol.Optional(CONF_PROXY_PORT, default=DEFAULT_PROXY_PORT): vol.All(
+                    vol.Coerce(int), vol.Range(min=0, max=65535)
+                ),
+                vol.Optional(CONF_PROXY_HOST, default=DEFAULT_PROXY_HOST): str,
+                vol.Optional(CONF_PROXY_MAX_AGE, default=DEFAULT_PROXY_MAX_AGE): vol.All(
+                    vol.Coerce(int), vol.Range(min=1, max=3600)
+                ),
+            }),
+            errors=errors,
+        )
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Return the options flow."""
+        return LambdaHeatpumpOptionsFlow(config_entry)
+
+
+class LambdaHeatpumpOptionsFlow(config_entries.OptionsFlow):
+    """Re-scan the modules and adjust sampling and state filtering."""
+
+    def __init__(self, config_entry):
+        """Initialize the options flow."""
+        self._entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        """Offer a re-scan of the installed modules, the sampling and the deadband options."""
+        errors = {}
+
+        if user_input is not None:
+            options = {key: value for key, value in user_input.items() if key != "rescan"}
+            if not user_input["rescan"]:
+                return self.async_create_entry(title="", data=options)
+            modules = await _async_discover_modules(self.hass, self._entry.data[CONF_IP_ADDRESS])
+            if modules is None:
+                errors["base"] = "cannot_connect"
+            else:
+                # Die Topologie liegt in entry.data; die Änderung lädt den Eintrag neu
+                self.hass.config_entries.async_update_entry(
+                    self._entry, data={**self._entry.data, CONF_MODULES: modules}
+                )
+                return self.async_create_entry(title="", data=options)
+
+        options = self._entry.options
+        register_map = await self.hass.async_add_executor_job(
+            load_register_map, self._entry.data.get(CONF_REGISTER_MAP, DEFAULT_REGISTER_MAP)
+        )
+        sensors = sampling_candidates(
+            expand_sensors(self._entry.data.get(CONF_MODULES, DEFAULT_MODULES), register_map)
+        )
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema({
+                vol.Optional("rescan", default=False): cv.boolean,
+                vol.Optional(
+                    CONF_SAMPLED_SENSORS, default=options.get(CONF_SAMPLED_SENSORS, [])
+                ): cv.multi_select({sensor["name"]: sensor["name"] for sensor in sensors}),
+                vol.Optional(
+                    CONF_SAMPLING_INTERVAL,
+                    default=options.get(CONF_SAMPLING_INTERVAL, DEFAULT_SAMPLING_INTERVAL),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=60)),
+                vol.Optional(
+                    CONF_TEMPERATURE_DEADBAND,
+                    default=options.get(CONF_TEMPERATURE_DEADBAND, DEFAULT_TEMPERATURE_DEADBAND),
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, max=10)),
+                vol.Optional(
+                    CONF_RELATIVE_DEADBAND, default=options.get(CONF_RELATIVE_DEADBAND, DEFAULT_RELATIVE_DEADBAND)
+                ): vol.All(vol.Coerce(float), vol.Range(min=0, max=50)),
+                vol.Optional(CONF_HEARTBEAT, default=options.get(CONF_HEARTBEAT, DEFAULT_HEARTBEAT)): vol.All(
+                    vol.Coerce(int), vol.Range(min=0, max=86400)
+                ),
+                vol.Optional(CONF_CAPTURE, default=options.get(CONF_CAPTURE, False)): cv.boolean,
+                vol.Optional(
+                    CONF_CAPTURE_MAX_SIZE, default=options.get(CONF_CAPTURE_MAX_SIZE, DEFAULT_CAPTURE_MAX_SIZE)
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=1024)),
             }),
+            description_placeholders={"modules": _describe_modules(self._entry.data.get(CONF_MODULES, {}))},
             errors=errors,
         )
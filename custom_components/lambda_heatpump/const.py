@@ -0,0 +1,30 @@
+"""Constants for the Lambda Heatpump integration."""
+
+DOMAIN = "lambda_heatpump"
+
+# Prozessweite Modbus-Verbindungen, gemeinsam für alle Einträge und den Config Flow
+DATA_CONNECTIONS = f"{DOMAIN}_connections"
+
+CONF_UPDATE_INTERVAL = "update_interval"
+CONF_FAST_UPDATE_INTERVAL = "fast_update_interval"
+CONF_SLOW_UPDATE_INTERVAL = "slow_update_interval"
+CONF_MAX_REGISTER_GAP = "max_register_gap"
+CONF_MAX_VALUE_AGE = "max_value_age"
+CONF_MODULES = "modules"
+CONF_REGISTER_MAP = "register_map"
+CONF_PROXY_PORT = "proxy_port"
+CONF_PROXY_HOST = "proxy_host"
+CONF_PROXY_MAX_AGE = "proxy_max_age"
+
+# Optionen: hochfrequent abgetastete Sensoren
+CONF_SAMPLED_SENSORS = "sampled_sensors"
+CONF_SAMPLING_INTERVAL = "sampling_interval"
+
+# Optionen: Totband und Heartbeat für Zustandsänderungen
+CONF_HEARTBEAT = "heartbeat"
+CONF_TEMPERATURE_DEADBAND = "temperature_deadband"
+CONF_RELATIVE_DEADBAND = "relative_deadband"
+
+# Optionen: Mitschnitt der rohen Registerblöcke
+CONF_CAPTURE = "capture"
+CONF_CAPTURE_MAX_SIZE = "capture_max_size"
@@ -0,0 +1,49 @@
+"""Diagnostics support for Lambda Heatpump."""
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.const import CONF_IP_ADDRESS
+
+from .const import DOMAIN
+
+TO_REDACT = {CONF_IP_ADDRESS}
+
+
+async def async_get_config_entry_diagnostics(hass, entry):
+    """Return diagnostics for a config entry."""
+    runtime = hass.data[DOMAIN].get(entry.entry_id, {})
+    capture = runtime.get("capture")
+    client_manager = runtime.get("client_manager")
+    coordinator = runtime.get("coordinator")
+    proxy = runtime.get("proxy")
+    sampler = runtime.get("sampler")
+    write_queue = runtime.get("write_queue")
+
+    diagnostics = {"config": async_redact_data(dict(entry.data), TO_REDACT)}
+    if "register_map" in runtime:
+        register_map = runtime["register_map"]
+        diagnostics["register_map"] = {
+            "key": register_map.key,
+            "model": register_map.model,
+            "firmware": register_map.firmware,
+        }
+    if client_manager is not None:
+        diagnostics["read_plan"] = [f"{start}-{end}" for start, end in client_manager.register_blocks]
+        diagnostics["paused_blocks"] = [f"{start}-{end}" for start, end in client_manager.paused_blocks]
+        diagnostics["poll_intervals"] = client_manager.poll_intervals
+        diagnostics["statistics"] = client_manager.statistics.as_dict()
+        diagnostics["connection"] = {
+            "connected": client_manager.connection.connected,
+            "references": client_manager.connection.references,
+            "generation": client_manager.connection.generation,
+        }
+    if write_queue is not None:
+        diagnostics["writes"] = write_queue.as_dict()
+    if sampler is not None:
+        diagnostics["sampler"] = sampler.as_dict()
+    if proxy is not None:
+        diagnostics["proxy"] = proxy.device.as_dict()
+    if capture is not None:
+        diagnostics["capture"] = capture.as_dict()
+    if coordinator is not None:
+        diagnostics["last_update_success"] = coordinator.last_update_success
+        diagnostics["data"] = coordinator.data
+    return diagnostics
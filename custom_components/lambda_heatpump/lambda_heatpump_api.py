@@ -1,16 +1,1133 @@
 """API for communicating with Lambda Heatpump via Modbus TCP."""
-from pymodbus.client import ModbusTcpClient
+from array import array
+import asyncio
+from bisect import bisect_left
+from collections import deque
+import importlib
+import logging
+import random
+import struct
+import sys
+import time
 
-async def detect_lambda_model(ip_address):
-    """Detect the Lambda Heatpump model."""
-    client = ModbusTcpClient(ip_address)
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PORT = 502
+DEFAULT_TIMEOUT = 5  # Sekunden pro Modbus-Anfrage
+DEFAULT_RETRIES = 1
+DEVICE_ID = 1
+MAX_REGISTERS_PER_READ = 125  # Modbus-Limit für read_holding_registers
+DEFAULT_MAX_REGISTER_GAP = 4  # Ungenutzte Register, die noch mitgelesen werden
+
+# Abfrageklassen: schnell veränderliche Leistungswerte, normale Messwerte,
+# selten veränderliche Sollwerte, Fehlernummern und Betriebsarten
+POLL_TIER_FAST = "fast"
+POLL_TIER_NORMAL = "normal"
+POLL_TIER_SLOW = "slow"
+DEFAULT_POLL_INTERVALS = {
+    POLL_TIER_FAST: 5,
+    POLL_TIER_NORMAL: 30,
+    POLL_TIER_SLOW: 600,
+}
+
+# Wie lange ein Wert nach seinem planmäßigen nächsten Lesezeitpunkt noch gültig bleibt
+DEFAULT_MAX_VALUE_AGE = 300
+
+# Spätestens nach dieser Zeit (Sekunden) wird ein durch das Totband zurückgehaltener Wert geschrieben
+DEFAULT_HEARTBEAT = 900
+
+# Schreibzugriffe: Mindestabstand zwischen zwei Schreibanfragen (Sekunden), Modbus-Limit
+# für write_multiple_registers und Frist für die Bestätigung per Rücklesen (Sekunden)
+DEFAULT_WRITE_INTERVAL = 1
+MAX_REGISTERS_PER_WRITE = 123
+WRITE_CONFIRM_TIMEOUT = 900
+
+# Hochfrequente Abtastung ausgewählter Sensoren (Sekunden, Anzahl Werte je Sensor)
+DEFAULT_SAMPLING_INTERVAL = 1
+DEFAULT_SAMPLE_CAPACITY = 3600
+
+# Lokaler Modbus-Proxy: Port 0 = aus; nur lokal erreichbar, solange keine andere Adresse gewählt ist;
+# Register aus dem Cache, wenn nicht älter als (Sekunden)
+DEFAULT_PROXY_PORT = 0
+DEFAULT_PROXY_HOST = "127.0.0.1"
+DEFAULT_PROXY_MAX_AGE = 30
+
+# Mitschnitt der rohen Blockantworten: Größe einer Datei (MiB) und Anzahl älterer Dateien
+DEFAULT_CAPTURE_MAX_SIZE = 16
+DEFAULT_CAPTURE_BACKUPS = 4
+
+# Neuverbindung mit exponentiellem Backoff (Sekunden)
+RECONNECT_DELAY_MIN = 2
+RECONNECT_DELAY_MAX = 300
+
+# Circuit Breaker: Blöcke, die wiederholt fehlschlagen, werden pausiert (Sekunden)
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN_MIN = 600
+BREAKER_COOLDOWN_MAX = 6 * 3600
+
+
+# pymodbus wird erst beim ersten Verbindungsaufbau geladen: der Import dauert länger als
+# der Rest der Integration und verzögert sonst den Start von Home Assistant
+def _create_client(ip_address, port=DEFAULT_PORT, timeout=DEFAULT_TIMEOUT):
+    """Create an async Modbus TCP client without pymodbus' own reconnect loop."""
+    from pymodbus import __version__ as pymodbus_version
+    from pymodbus.client import AsyncModbusTcpClient
+
+    _LOGGER.info("Lambda Heatpump: using pymodbus %s", pymodbus_version)
+    return AsyncModbusTcpClient(
+        ip_address,
+        port=port,
+        timeout=timeout,
+        retries=DEFAULT_RETRIES,
+        reconnect_delay=0,
+    )
+
+
+async def _async_create_client(ip_address, port=DEFAULT_PORT, timeout=DEFAULT_TIMEOUT):
+    """Create the client, importing pymodbus in an executor on first use."""
+    if "pymodbus.client" not in sys.modules:
+        await asyncio.get_running_loop().run_in_executor(None, importlib.import_module, "pymodbus.client")
+    return _create_client(ip_address, port, timeout)
+
+
+def _modbus_errors():
+    """Return the exception types of a failed Modbus request."""
+    from pymodbus.exceptions import ModbusException
+
+    return ModbusException, TimeoutError, OSError
+
+
+def _no_response_errors():
+    """Return the exception types of a request the controller did not answer."""
+    from pymodbus.exceptions import ModbusIOException
+
+    return ModbusIOException, TimeoutError
+
+
+# Module der Lambda-Steuerung: erstes Register, Anzahl möglicher Instanzen;
+# jede weitere Instanz liegt MODULE_STRIDE Register weiter (z. B. Heizkreis 2 ab 5100)
+MODULE_STRIDE = 100
+MODULES = {
+    "heat_pump": (1000, 3),
+    "boiler": (2000, 5),
+    "buffer": (3000, 5),
+    "solar": (4000, 2),
+    "heating_circuit": (5000, 12),
+}
+
+
+class RegisterCache:
+    """Raw holding registers as last read from the controller, with their read time."""
+
+    __slots__ = ("_values", "_times")
+
+    def __init__(self):
+        self._values = {}
+        self._times = {}
+
+    def update(self, address, registers, now=None):
+        """Store registers read starting at ``address``."""
+        now = time.monotonic() if now is None else now
+        for register, value in enumerate(registers, address):
+            self._values[register] = value
+            self._times[register] = now
+
+    def invalidate(self, address, count=1):
+        """Forget registers, e.g. after they were written."""
+        for register in range(address, address + count):
+            self._values.pop(register, None)
+            self._times.pop(register, None)
+
+    def get(self, address, count, max_age, now=None):
+        """Return ``count`` registers read within ``max_age`` seconds, or None."""
+        oldest = (time.monotonic() if now is None else now) - max_age
+        times = self._times
+        registers = range(address, address + count)
+        if any(times.get(register, oldest - 1) < oldest for register in registers):
+            return None
+        return [self._values[register] for register in registers]
+
+    def __len__(self):
+        return len(self._values)
+
+
+class ModbusConnection:
+    """One persistent Modbus TCP session to a controller, shared by all its users.
+
+    Requests are serialized, so config entries, platforms and the config
+    flow can use the same session concurrently. Reconnects back off
+    exponentially with jitter.
+    """
+
+    def __init__(self, host, port=DEFAULT_PORT, timeout=DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        # Der Client entsteht erst beim ersten Verbindungsaufbau
+        self.client = None
+        self.references = 0
+        # Letzter Stand aller gelesenen Register, z. B. für den lokalen Modbus-Proxy
+        self.cache = RegisterCache()
+        # Zählt erfolgreiche Verbindungsaufbauten, damit Nutzer eine neue Sitzung erkennen
+        self.generation = 0
+        self._lock = asyncio.Lock()
+        self._reconnect_at = 0
+        self._reconnect_attempts = 0
+        self.closed = False
+
+    @property
+    def connected(self):
+        """Return True if the session is open."""
+        return self.client is not None and self.client.connected
+
+    def backing_off(self, now=None):
+        """Return True while a reconnect is not yet allowed."""
+        return (time.monotonic() if now is None else now) < self._reconnect_at
+
+    async def connect(self):
+        """Open the session unless it is open already or backing off."""
+        async with self._lock:
+            if self.closed or self.backing_off():
+                return False
+            if self.client is None:
+                self.client = await _async_create_client(self.host, self.port, self.timeout)
+            if self.client.connected:
+                return True
+            try:
+                async with asyncio.timeout(self.timeout):
+                    connected = await self.client.connect()
+            except (TimeoutError, OSError):
+                connected = False
+            if connected:
+                self.generation += 1
+                self._reconnect_attempts = 0
+                self._reconnect_at = 0
+            else:
+                self.drop()
+            return connected
+
+    def drop(self):
+        """Close the session and back off exponentially with jitter."""
+        if self.client is not None:
+            self.client.close()
+        delay = min(RECONNECT_DELAY_MAX, RECONNECT_DELAY_MIN * 2 ** self._reconnect_attempts)
+        delay = random.uniform(delay / 2, delay)
+        self._reconnect_attempts += 1
+        self._reconnect_at = time.monotonic() + delay
+        _LOGGER.warning(
+            "Connection to Lambda Heatpump at %s:%s lost, next attempt in %.0f s",
+            self.host, self.port, delay,
+        )
+
+    def _connected_client(self):
+        """Return the client, failing like a closed socket before the first connect."""
+        if self.client is None:
+            raise ConnectionError(f"Not connected to {self.host}:{self.port}")
+        return self.client
+
+    async def read_holding_registers(self, address, count=1):
+        """Read holding registers, waiting for requests of other users to finish."""
+        async with self._lock:
+            result = await self._connected_client().read_holding_registers(address, count=count, device_id=DEVICE_ID)
+        if not result.isError():
+            self.cache.update(address, result.registers)
+        return result
+
+    async def write_registers(self, address, values):
+        """Write holding registers; the written range is re-read on its next poll."""
+        async with self._lock:
+            result = await self._connected_client().write_registers(address, list(values), device_id=DEVICE_ID)
+        # Die Steuerung kann Werte begrenzen, daher nicht den geschriebenen Wert cachen
+        self.cache.invalidate(address, len(values))
+        return result
+
+    def close(self):
+        """Close the session for good."""
+        self.closed = True
+        if self.client is not None:
+            self.client.close()
+
+
+class ConnectionPool:
+    """Reference-counted registry of shared connections keyed by host and port."""
+
+    def __init__(self):
+        self._connections = {}
+
+    def acquire(self, host, port=DEFAULT_PORT, timeout=DEFAULT_TIMEOUT):
+        """Return the connection for a controller and take a reference on it."""
+        connection = self._connections.get((host, port))
+        if connection is None or connection.closed:
+            connection = self._connections[(host, port)] = ModbusConnection(host, port, timeout)
+        connection.references += 1
+        return connection
+
+    def release(self, connection):
+        """Drop a reference and close the connection once it is no longer used."""
+        connection.references -= 1
+        if connection.references > 0:
+            return
+        connection.close()
+        if self._connections.get((connection.host, connection.port)) is connection:
+            del self._connections[(connection.host, connection.port)]
+
+    def close(self):
+        """Close all connections."""
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
+
+
+async def _probe(connection, register):
+    """Return the register value, or None if the controller rejects the read."""
+    result = await connection.read_holding_registers(register, count=1)
+    if result.isError():
+        return None
+    return result.registers[0]
+
+
+async def discover_modules(connection):
+    """Probe the base register of every module instance.
+
+    Returns a dict mapping each module to the list of present instance
+    numbers (1-based), or None if the controller cannot be reached.
+    """
+    modules = {}
     try:
-        # Beispiel: Lese ein spezifisches Register, um das Modell zu identifizieren
-        model_register = 1000  # Ersetze dies durch das tatsächliche Register
-        # result = client.read_holding_registers(model_register, 1)
-        result = client.read_holding_registers(model_register, count=1, device_id=1)
-        if result.isError():
+        if not await connection.connect():
             return None
-        return f"Model {result.registers[0]}"
-    finally:
-        client.close()
+        for module, (base, count) in MODULES.items():
+            modules[module] = []
+            for index in range(1, count + 1):
+                try:
+                    value = await _probe(connection, base + (index - 1) * MODULE_STRIDE)
+                except _no_response_errors():
+                    # Keine Antwort: Modul gilt als nicht vorhanden, Verbindung ggf. erneuern
+                    if not connection.connected and not await connection.connect():
+                        return None
+                    value = None
+                if value is not None:
+                    modules[module].append(index)
+    except _modbus_errors() as e:
+        _LOGGER.debug("Lambda module discovery at %s failed: %s", connection.host, e)
+        return None
+    _LOGGER.info("Discovered Lambda modules at %s: %s", connection.host, modules)
+    return modules
+
+
+def sensor_register_span(sensor):
+    """Return the (first, last) register occupied by a sensor."""
+    return sensor.span
+
+
+def plan_register_blocks(sensors, max_gap=DEFAULT_MAX_REGISTER_GAP, max_count=MAX_REGISTERS_PER_READ):
+    """Compute the fewest register blocks that cover all given sensors.
+
+    Neighbouring sensors are read in one request as long as the unused
+    registers between them do not exceed ``max_gap`` and the block stays
+    within ``max_count`` registers. A multi-register value is never split
+    across two requests.
+    """
+    blocks = []
+    for start, end in sorted({sensor_register_span(sensor) for sensor in sensors}):
+        if blocks:
+            block_start, block_end = blocks[-1]
+            merged_end = max(end, block_end)
+            if start - block_end - 1 <= max_gap and merged_end - block_start + 1 <= max_count:
+                blocks[-1] = (block_start, merged_end)
+                continue
+        blocks.append((start, end))
+    return blocks
+
+
+def combine_words(low, high, word_order="auto"):
+    """Combine the two 16-bit words of an int32 sensor into one value.
+
+    ``word_order`` is ``"low_high"`` or ``"high_low"`` for a fixed order of
+    the configured registers; ``"auto"`` applies the heuristic below.
+    """
+    if word_order == "low_high":
+        return (high << 16) | low
+    if word_order == "high_low":
+        return (low << 16) | high
+
+    # Auto-detect 16-bit vs 32-bit and handle word-order edge cases
+    # Cases:
+    #  A) Only LOW has data  -> uint16 (value = low)
+    #  B) Only HIGH has data -> uint16 (value = high) [typical when lower 16 bits are always 0]
+    #  C) Both words present -> uint32 (value = (HIGH<<16)|LOW)
+    #  D) If (C) looks implausible, try swapped fallback.
+    if low != 0 and high == 0:
+        return low
+    if high != 0 and low == 0:
+        return high
+    value = (high << 16) | low
+    swapped = (low << 16) | high
+    if (value & 0xFFFF) == 0 and (swapped & 0xFFFF) != 0 and swapped < value:
+        return swapped
+    return value
+
+
+class BlockDecoder:
+    """Precompiled decoder for the sensors inside one register block.
+
+    The sensor table is translated once into a ``struct`` format over the
+    raw registers (``h``/``H`` per 16-bit sensor, ``HH`` per int32 sensor,
+    padding for registers nobody uses), so a poll cycle decodes a block
+    with a single ``unpack_from`` and one linear pass over the fields.
+    """
+
+    __slots__ = ("start", "end", "count", "names", "_struct", "_fields")
+
+    def __init__(self, start, end, sensors):
+        self.start = start
+        self.end = end
+        self.count = end - start + 1
+        fmt = ["="]
+        fields = []
+        position = start
+        for sensor in sorted(sensors, key=sensor_register_span):
+            first, last = sensor_register_span(sensor)
+            if first < position or last > end:
+                raise ValueError(f"Sensor {sensor['name']} does not fit into block {start}-{end}")
+            if first > position:
+                fmt.append(f"{2 * (first - position)}x")
+            # int32 ("HH"): erstes Register ist das LOW word, word_order nur bei int32 gesetzt
+            fmt.append(sensor.struct_format)
+            fields.append((sensor.name, sensor.scale, sensor.precision, sensor.word_order))
+            position = last + 1
+        self._struct = struct.Struct("".join(fmt))
+        self._fields = tuple(fields)
+        self.names = tuple(field[0] for field in fields)
+
+    def decode(self, registers, data):
+        """Decode a block's raw registers into ``data``."""
+        self.decode_buffer(array("H", registers).tobytes(), data)
+
+    def decode_buffer(self, buffer, data, offset=0):
+        """Decode the block's registers from a buffer in native byte order, e.g. a capture file."""
+        values = iter(self._struct.unpack_from(buffer, offset))
+        for name, scale, precision, word_order in self._fields:
+            value = next(values)
+            if word_order is not None:
+                value = combine_words(value, next(values), word_order)
+            data[name] = round(value * scale, precision)
+
+
+def encode_value(sensor, value):
+    """Return the raw 16-bit register value of a sensor value."""
+    raw = round(value / sensor.get("scale", 1))
+    low, high = (-0x8000, 0x7FFF) if sensor.get("data_type") == "int16" else (0, 0xFFFF)
+    if not low <= raw <= high:
+        raise ValueError(f"{value} is out of range for {sensor['name']}")
+    return raw & 0xFFFF
+
+
+def decode_value(sensor, raw):
+    """Return the sensor value of a raw 16-bit register value."""
+    if sensor.get("data_type") == "int16" and raw >= 0x8000:
+        raw -= 0x10000
+    return round(raw * sensor.get("scale", 1), sensor.get("precision", 0))
+
+
+def compile_read_plan(sensors, max_gap=DEFAULT_MAX_REGISTER_GAP, max_count=MAX_REGISTERS_PER_READ):
+    """Plan the register blocks for ``sensors`` and compile a decoder for each."""
+    sensors = sorted(sensors, key=sensor_register_span)
+    plan = []
+    index = 0
+    for start, end in plan_register_blocks(sensors, max_gap, max_count):
+        members = []
+        while index < len(sensors) and sensor_register_span(sensors[index])[0] <= end:
+            members.append(sensors[index])
+            index += 1
+        plan.append(BlockDecoder(start, end, members))
+    return plan
+
+
+# Obergrenzen der Latenz-Histogramm-Buckets (Sekunden), der letzte Bucket ist offen
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class BlockStatistics:
+    """Request counters and latency histogram of one register block."""
+
+    __slots__ = ("requests", "errors", "timeouts", "latency_sum", "latency_max", "histogram")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record(self, latency):
+        """Record the latency of a completed request."""
+        self.requests += 1
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        self.histogram[bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def as_dict(self):
+        """Return the statistics as a JSON serializable dict."""
+        labels = [f"<={bucket}s" for bucket in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}s"]
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "latency_avg": self.latency_sum / self.requests if self.requests else None,
+            "latency_max": self.latency_max,
+            "latency_histogram": dict(zip(labels, self.histogram)),
+        }
+
+
+class PollStatistics:
+    """Instrumentation of the poll cycles of one ModbusClientManager."""
+
+    def __init__(self):
+        self.blocks = {}
+        self.cycles = 0
+        self.connects = 0
+        self.connect_failures = 0
+        self.last_cycle_duration = None
+        self.last_decode_duration = None
+        self._error_times = deque()
+
+    def block(self, block):
+        """Return the statistics of a register block."""
+        key = (block.start, block.end)
+        if key not in self.blocks:
+            self.blocks[key] = BlockStatistics()
+        return self.blocks[key]
+
+    def record_error(self, block, now, timeout=False):
+        """Count a failed request of a register block."""
+        stats = self.block(block)
+        stats.errors += 1
+        if timeout:
+            stats.timeouts += 1
+        self._error_times.append(now)
+
+    @property
+    def reconnects(self):
+        """Return the number of successful connects after the first one."""
+        return max(0, self.connects - 1)
+
+    def errors_last_hour(self, now=None):
+        """Return the number of failed requests within the last hour."""
+        now = time.monotonic() if now is None else now
+        while self._error_times and self._error_times[0] < now - 3600:
+            self._error_times.popleft()
+        return len(self._error_times)
+
+    def as_dict(self):
+        """Return all statistics as a JSON serializable dict."""
+        return {
+            "cycles": self.cycles,
+            "last_cycle_duration": self.last_cycle_duration,
+            "last_decode_duration": self.last_decode_duration,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "connect_failures": self.connect_failures,
+            "errors_last_hour": self.errors_last_hour(),
+            "blocks": {f"{start}-{end}": stats.as_dict() for (start, end), stats in sorted(self.blocks.items())},
+        }
+
+
+class DeadbandFilter:
+    """Decide whether a new sensor value is worth a state write.
+
+    Numeric values are published once they differ from the last published
+    value by at least ``absolute`` or ``relative`` (fraction of that value),
+    or when the last publish is older than ``heartbeat`` seconds. Other
+    values, e.g. texts of enum sensors, are published on every change.
+    """
+
+    __slots__ = ("absolute", "relative", "heartbeat", "_value", "_published_at")
+
+    def __init__(self, absolute=0, relative=0, heartbeat=None):
+        self.absolute = absolute
+        self.relative = relative
+        self.heartbeat = heartbeat
+        self._value = None
+        self._published_at = None
+
+    def update(self, value, now=None, force=False):
+        """Return True and remember the value if it should be published."""
+        now = time.monotonic() if now is None else now
+        if not force and self._published_at is not None:
+            if value == self._value:
+                return False
+            if isinstance(value, (int, float)) and isinstance(self._value, (int, float)):
+                threshold = max(self.absolute, self.relative * abs(self._value))
+                # Kleine Toleranz, da gerundete Werte als float nie exakt auf der Schwelle liegen
+                within = abs(value - self._value) + 1e-9 < threshold
+                if within and (self.heartbeat is None or now - self._published_at < self.heartbeat):
+                    return False
+        self._value = value
+        self._published_at = now
+        return True
+
+
+class WriteQueue:
+    """Coalesce, batch and rate-limit register writes to the controller.
+
+    Only the latest value per register is kept, adjacent registers are
+    written with one write_multiple_registers request and every request,
+    also within one flush, is at least ``min_interval`` after the previous. A write is confirmed by the next poll
+    cycle reading the register back (see ``verify``) instead of an extra
+    round trip.
+    """
+
+    def __init__(self, connection, min_interval=DEFAULT_WRITE_INTERVAL, on_written=None):
+        self.connection = connection
+        self.min_interval = min_interval
+        self._on_written = on_written
+        self._pending = {}
+        self._unconfirmed = {}
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self.requests = 0
+        self.registers_written = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.confirmed = 0
+        self.rejected = 0
+
+    def write(self, register, value):
+        """Queue a raw register value, replacing a value still waiting for the same register."""
+        if register in self._pending:
+            self.coalesced += 1
+        self._pending[register] = value
+        self._wakeup.set()
+
+    def expected(self, register):
+        """Return the raw value queued or written but not yet read back, or None."""
+        if register in self._pending:
+            return self._pending[register]
+        if register in self._unconfirmed:
+            return self._unconfirmed[register][0]
+        return None
+
+    @staticmethod
+    def batches(values, max_count=MAX_REGISTERS_PER_WRITE):
+        """Group {register: value} into (start, [values]) runs of adjacent registers."""
+        batches = []
+        for register in sorted(values):
+            if batches and register == batches[-1][0] + len(batches[-1][1]) and len(batches[-1][1]) < max_count:
+                batches[-1][1].append(values[register])
+            else:
+                batches.append((register, [values[register]]))
+        return batches
+
+    async def flush(self):
+        """Write all queued values, one request at least ``min_interval`` after the other.
+
+        Each request takes the first batch of the queue as it is then, so
+        values queued in between are coalesced. Writes that failed on the
+        transport (timeout, connection) are queued again unless superseded;
+        writes the controller rejects with an exception response are dropped.
+        """
+        failed = {}
+        first = True
+        while self._pending and not self._closed:
+            if not first:
+                await asyncio.sleep(self.min_interval)
+                if not self._pending:
+                    break
+            first = False
+            start, values = self.batches(self._pending)[0]
+            for register in range(start, start + len(values)):
+                del self._pending[register]
+            try:
+                result = await self.connection.write_registers(start, values)
+            except _modbus_errors() as e:
+                self.failures += 1
+                _LOGGER.warning("Writing registers %s to %s failed: %s", start, start + len(values) - 1, e)
+                failed.update(enumerate(values, start))
+                continue
+            if result.isError():
+                # Ungültige Adresse oder ungültiger Wert: eine Wiederholung würde erneut abgelehnt
+                self.rejected += len(values)
+                _LOGGER.error("Registers %s to %s rejected the write: %s", start, start + len(values) - 1, result)
+                continue
+            self.requests += 1
+            self.registers_written += len(values)
+            now = time.monotonic()
+            written = list(range(start, start + len(values)))
+            for register, value in zip(written, values):
+                self._unconfirmed[register] = (value, now)
+            if self._on_written is not None:
+                self._on_written(written)
+        # Erst jetzt wieder einreihen, sonst würde dieselbe Sitzung sie sofort erneut versuchen
+        for register, value in failed.items():
+            self._pending.setdefault(register, value)
+
+    async def run(self):
+        """Process the queue until it is closed."""
+        while not self._closed:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self._closed:
+                break
+            connection = self.connection
+            if connection.connected or (not connection.backing_off() and await connection.connect()):
+                await self.flush()
+            # Ratenbegrenzung; in der Zwischenzeit eingereihte Werte werden zusammengefasst
+            await asyncio.sleep(self.min_interval)
+            if self._pending:
+                self._wakeup.set()
+
+    def verify(self, now=None):
+        """Compare written registers with the values read back after the write."""
+        now = time.monotonic() if now is None else now
+        for register, (value, written_at) in list(self._unconfirmed.items()):
+            read = self.connection.cache.get(register, 1, now - written_at, now)
+            if read is None:
+                if now - written_at > WRITE_CONFIRM_TIMEOUT:
+                    _LOGGER.warning("Write of register %s was not read back within %s s", register, WRITE_CONFIRM_TIMEOUT)
+                    del self._unconfirmed[register]
+                continue
+            del self._unconfirmed[register]
+            if read[0] == value:
+                self.confirmed += 1
+            else:
+                self.rejected += 1
+                _LOGGER.warning("Register %s reads %s after writing %s", register, read[0], value)
+
+    def as_dict(self):
+        """Return the write statistics for diagnostics."""
+        return {
+            "pending": len(self._pending),
+            "unconfirmed": len(self._unconfirmed),
+            "requests": self.requests,
+            "registers_written": self.registers_written,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "confirmed": self.confirmed,
+            "rejected": self.rejected,
+        }
+
+    def close(self):
+        """Stop processing the queue."""
+        self._closed = True
+        self._wakeup.set()
+
+
+class SampleBuffer:
+    """Fixed-size ring buffer of (timestamp, value) samples backed by two arrays."""
+
+    __slots__ = ("capacity", "_times", "_values", "_next", "_count")
+
+    def __init__(self, capacity=DEFAULT_SAMPLE_CAPACITY):
+        self.capacity = capacity
+        self._times = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, timestamp, value):
+        """Store a sample, overwriting the oldest one once the buffer is full."""
+        self._times[self._next] = timestamp
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def _indexes(self, since):
+        """Return the buffer positions of all samples newer than ``since``, oldest first."""
+        # Zeitstempel sind aufsteigend: vom neuesten Wert rückwärts bis zum ersten älteren
+        positions = []
+        index = self._next
+        for _ in range(self._count):
+            index = (index - 1) % self.capacity
+            if since is not None and self._times[index] <= since:
+                break
+            positions.append(index)
+        positions.reverse()
+        return positions
+
+    def samples(self, since=None):
+        """Return the samples newer than ``since`` as (timestamp, value) tuples."""
+        return [(self._times[index], self._values[index]) for index in self._indexes(since)]
+
+    def aggregate(self, since=None):
+        """Return mean, min, max, last and count of the samples newer than ``since``."""
+        values = [self._values[index] for index in self._indexes(since)]
+        if not values:
+            return None
+        return {
+            "mean": sum(values) / len(values),
+            "min": min(values),
+            "max": max(values),
+            "last": values[-1],
+            "count": len(values),
+        }
+
+
+class HighRateSampler:
+    """Read a few sensors at a high rate over the shared connection into ring buffers.
+
+    Only the sampled sensors' blocks are read, so the regular poll
+    cycle and the Home Assistant recorder are not involved.
+    """
+
+    def __init__(
+        self,
+        connection,
+        sensors,
+        interval=DEFAULT_SAMPLING_INTERVAL,
+        capacity=DEFAULT_SAMPLE_CAPACITY,
+        max_gap=DEFAULT_MAX_REGISTER_GAP,
+    ):
+        self.connection = connection
+        self.interval = interval
+        self.plan = compile_read_plan(sensors, max_gap)
+        self.buffers = {sensor["name"]: SampleBuffer(capacity) for sensor in sensors}
+        self.cycles = 0
+        self.errors = 0
+        self.overruns = 0
+        self._closed = False
+
+    async def sample(self):
+        """Read all sampled sensors once and append their values."""
+        connection = self.connection
+        if not connection.connected and (connection.backing_off() or not await connection.connect()):
+            return
+        timestamp = time.time()
+        data = {}
+        for block in self.plan:
+            try:
+                result = await connection.read_holding_registers(block.start, count=block.count)
+            except _modbus_errors() as e:
+                # Die Neuverbindung übernimmt der reguläre Abfragezyklus
+                self.errors += 1
+                _LOGGER.debug("Sampling registers %s to %s failed: %s", block.start, block.end, e)
+                return
+            if result.isError():
+                self.errors += 1
+                continue
+            try:
+                block.decode(result.registers, data)
+            except struct.error:
+                self.errors += 1
+        for name, value in data.items():
+            if value != 0x8000:
+                self.buffers[name].append(timestamp, value)
+        self.cycles += 1
+
+    async def run(self):
+        """Sample at a fixed rate until the sampler is closed."""
+        next_sample = time.monotonic()
+        while not self._closed:
+            await self.sample()
+            next_sample += self.interval
+            delay = next_sample - time.monotonic()
+            if delay < 0:
+                # Lesen dauert länger als der Takt: verpasste Takte auslassen statt nachzuholen
+                self.overruns += 1
+                next_sample = time.monotonic()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    def aggregate(self, name, since=None):
+        """Return the aggregate of a sensor's samples newer than ``since``."""
+        return self.buffers[name].aggregate(since)
+
+    def export(self, name, since=None):
+        """Return a sensor's raw samples newer than ``since``."""
+        return self.buffers[name].samples(since)
+
+    def as_dict(self):
+        """Return the sampler statistics for diagnostics."""
+        return {
+            "interval": self.interval,
+            "blocks": [f"{block.start}-{block.end}" for block in self.plan],
+            "cycles": self.cycles,
+            "errors": self.errors,
+            "overruns": self.overruns,
+            "buffered": {name: len(buffer) for name, buffer in self.buffers.items()},
+        }
+
+    def close(self):
+        """Stop sampling."""
+        self._closed = True
+
+
+class CircuitBreaker:
+    """Pause polling of a register block that keeps failing.
+
+    After ``BREAKER_FAILURE_THRESHOLD`` consecutive failures the block is
+    skipped for a cooldown. The next attempt after the cooldown either
+    closes the breaker again or reopens it with a doubled cooldown.
+    """
+
+    __slots__ = ("failures", "open_until", "cooldown")
+
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0
+        self.cooldown = BREAKER_COOLDOWN_MIN
+
+    def allows(self, now):
+        """Return whether the block may be read at ``now``."""
+        return now >= self.open_until
+
+    def record_success(self):
+        """Close the breaker."""
+        self.failures = 0
+        self.open_until = 0
+        self.cooldown = BREAKER_COOLDOWN_MIN
+
+    def record_failure(self, now):
+        """Count a failure and return True if the breaker (re)opened."""
+        self.failures += 1
+        if self.failures < BREAKER_FAILURE_THRESHOLD:
+            return False
+        self.open_until = now + self.cooldown
+        self.cooldown = min(self.cooldown * 2, BREAKER_COOLDOWN_MAX)
+        return True
+
+
+class ModbusClientManager:
+    """Poll the sensors of one config entry over a (shared) Modbus connection.
+
+    Without ``connection`` the manager opens a private session that is
+    closed together with the manager. A ``capture`` writer receives the
+    raw registers of every block that was read successfully.
+    """
+
+    def __init__(
+        self,
+        ip_address,
+        sensors,
+        max_gap=DEFAULT_MAX_REGISTER_GAP,
+        poll_intervals=None,
+        max_value_age=DEFAULT_MAX_VALUE_AGE,
+        port=DEFAULT_PORT,
+        timeout=DEFAULT_TIMEOUT,
+        connection=None,
+        capture=None,
+    ):
+        self._owns_connection = connection is None
+        # Optionaler Mitschnitt der rohen Blockantworten (siehe capture.CaptureWriter)
+        self.capture = capture
+        self.connection = connection or ModbusConnection(ip_address, port, timeout)
+        self._generation = None
+        self.max_gap = max_gap
+        self.poll_intervals = {**DEFAULT_POLL_INTERVALS, **(poll_intervals or {})}
+        self._sensors = {sensor["name"]: sensor for sensor in sensors}
+        self._enabled = set(self._sensors)
+        self._required = set()
+        self._read_plans = {}
+        self._next_due = {}
+        self._data = {}
+        # Lebensdauer eines gelesenen Werts: Intervall seiner Abfrageklasse plus max_value_age
+        self._value_lifetime = {
+            name: self.poll_intervals[sensor.get("poll_tier", POLL_TIER_NORMAL)] + max_value_age
+            for name, sensor in self._sensors.items()
+        }
+        self._expires = {}
+        self._breakers = {}
+        self.statistics = PollStatistics()
+        self._lock = asyncio.Lock()
+        self._closed = False
+
+    @property
+    def sensors(self):
+        """Return the sensors that are currently polled."""
+        return [
+            sensor for name, sensor in self._sensors.items() if name in self._enabled or name in self._required
+        ]
+
+    @property
+    def poll_tiers(self):
+        """Return the poll tiers used by the enabled sensors."""
+        return {sensor.get("poll_tier", POLL_TIER_NORMAL) for sensor in self.sensors}
+
+    @property
+    def poll_interval(self):
+        """Return the scheduler tick, i.e. the shortest interval of any tier in use."""
+        return min(self.poll_intervals[tier] for tier in self.poll_tiers or {POLL_TIER_NORMAL})
+
+    @property
+    def register_blocks(self):
+        """Return the (start, end) register blocks of a full poll cycle."""
+        return [(block.start, block.end) for block in self.read_plan(self.poll_tiers)]
+
+    @property
+    def paused_blocks(self):
+        """Return the register blocks currently skipped by their circuit breaker."""
+        now = time.monotonic()
+        return [key for key, breaker in sorted(self._breakers.items()) if not breaker.allows(now)]
+
+    def read_plan(self, tiers):
+        """Return the compiled read plan for the sensors of the given poll tiers.
+
+        Sensors of all due tiers are planned together, so neighbouring
+        registers of different tiers still share one request.
+        """
+        key = frozenset(tiers)
+        if key not in self._read_plans:
+            sensors = [sensor for sensor in self.sensors if sensor.get("poll_tier", POLL_TIER_NORMAL) in key]
+            plan = self._read_plans[key] = compile_read_plan(sensors, self.max_gap)
+            _LOGGER.debug(
+                "Planned %d register reads for %d sensors in tiers %s: %s",
+                len(plan), len(sensors), sorted(key), [(block.start, block.end) for block in plan],
+            )
+        return self._read_plans[key]
+
+    def _due_tiers(self, now):
+        """Return the poll tiers that have to be read in this cycle."""
+        # Halber Takt Toleranz, damit ein leicht verfrühter Zyklus den Tier nicht verpasst
+        tolerance = self.poll_interval / 2
+        return {tier for tier in self.poll_tiers if self._next_due.get(tier, 0) <= now + tolerance}
+
+    def restore(self, values):
+        """Seed the last known values, e.g. from a snapshot, until they are read or expire."""
+        now = time.monotonic()
+        for name, value in values.items():
+            if name in self._sensors and value is not None and name not in self._data:
+                self._data[name] = value
+                self._expires[name] = now + self._value_lifetime[name]
+
+    def require_sensor(self, name):
+        """Poll a sensor regardless of its entity, e.g. for the state of a writable register."""
+        if name in self._sensors and name not in self._required:
+            self._required.add(name)
+            self._read_plans = {}
+
+    def request_read(self, registers):
+        """Read the poll tiers of the given registers in the next cycle."""
+        registers = set(registers)
+        for sensor in self.sensors:
+            first, last = sensor_register_span(sensor)
+            if any(first <= register <= last for register in registers):
+                self._next_due[sensor.get("poll_tier", POLL_TIER_NORMAL)] = 0
+
+    def set_sensor_enabled(self, name, enabled):
+        """Include or exclude a sensor from polling and invalidate the read plan."""
+        if name not in self._sensors or enabled == (name in self._enabled):
+            return
+        if enabled:
+            self._enabled.add(name)
+        else:
+            self._enabled.discard(name)
+        self._read_plans = {}
+        self._breakers = {}
+        if name not in self._required:
+            self._data.pop(name, None)
+
+    async def connect(self):
+        """Open the Modbus TCP connection, honouring the reconnect backoff."""
+        if self._closed:
+            return False
+        connection = self.connection
+        if not connection.connected:
+            if connection.backing_off():
+                return False
+            if await connection.connect():
+                self.statistics.connects += 1
+            else:
+                self.statistics.connect_failures += 1
+                return False
+        if connection.generation != self._generation:
+            # Neue Sitzung: alle Abfrageklassen sofort wieder lesen
+            self._generation = connection.generation
+            self._next_due.clear()
+        return True
+
+    def _block_failed(self, block, now, reason):
+        """Record a block the controller rejected, did not answer or that could not be decoded in the statistics and its circuit breaker."""
+        self.statistics.record_error(block, now, timeout=isinstance(reason, _no_response_errors()))
+        breaker = self._breakers.setdefault((block.start, block.end), CircuitBreaker())
+        log = _LOGGER.error if breaker.failures == 0 else _LOGGER.debug
+        log("Error reading registers from %s to %s: %s", block.start, block.end, reason)
+        if breaker.record_failure(now):
+            _LOGGER.warning(
+                "Registers %s to %s failed %d times in a row, pausing them for %.0f s",
+                block.start, block.end, breaker.failures, breaker.open_until - now,
+            )
+
+    async def fetch_data(self):
+        """Fetch the due poll tiers and return the latest values of all enabled sensors.
+
+        A failing block only affects its own sensors. Values that could not
+        be refreshed are kept until their lifetime expires, after which they
+        are reported as None.
+        """
+        async with self._lock:
+            now = time.monotonic()
+            cycle_start = time.perf_counter()
+            if await self.connect():
+                # Erst nach dem Verbindungsaufbau bestimmen: eine neue Sitzung macht alle Abfrageklassen fällig
+                due_tiers = self._due_tiers(now)
+                for tier in due_tiers:
+                    self._next_due[tier] = now + self.poll_intervals[tier]
+                self.statistics.last_decode_duration = await self._read_blocks(self.read_plan(due_tiers), now)
+                self.statistics.cycles += 1
+            self.statistics.last_cycle_duration = time.perf_counter() - cycle_start
+            return {
+                name: value if self._expires.get(name, 0) > now else None
+                for name, value in self._data.items()
+            }
+
+    async def _read_blocks(self, plan, now):
+        """Read and decode the blocks of a read plan and return the total decode time."""
+        decode_duration = 0.0
+        for block in plan:
+            if self._closed:
+                # Entladen während eines Abfragezyklus: keine weiteren Blöcke lesen
+                break
+            breaker = self._breakers.get((block.start, block.end))
+            if breaker is not None and not breaker.allows(now):
+                continue
+            _LOGGER.debug(f"Reading registers from {block.start} to {block.end} (count: {block.count})")
+
+            # Lese die Register im definierten Block
+            request_start = time.perf_counter()
+            try:
+                result = await self.connection.read_holding_registers(block.start, count=block.count)
+            except _modbus_errors() as e:
+                if isinstance(e, _no_response_errors()) and self.connection.connected:
+                    # Keine Antwort bei offener Sitzung: der Block selbst hängt (z. B. ein fehlendes Modul);
+                    # er zählt für seinen Circuit Breaker, die übrigen Blöcke werden weiter gelesen
+                    self._block_failed(block, now, e)
+                    continue
+                # Sitzung verloren: Zyklus abbrechen und mit Backoff neu verbinden. Der Block selbst ist
+                # nicht schuld, daher zählt der Fehler nicht für seinen Circuit Breaker
+                self.statistics.record_error(block, now, timeout=isinstance(e, _no_response_errors()))
+                _LOGGER.error("Error reading registers from %s to %s: %s", block.start, block.end, e)
+                if not self.connection.backing_off():
+                    self.connection.drop()
+                break
+            self.statistics.block(block).record(time.perf_counter() - request_start)
+
+            if result.isError():
+                self._block_failed(block, now, result)
+                continue
+            if self.capture is not None:
+                self.capture.append(time.time(), block.start, result.registers)
+
+            # Ordne die gelesenen Werte den Sensoren zu
+            decode_start = time.perf_counter()
+            try:
+                block.decode(result.registers, self._data)
+            except struct.error as e:
+                self._block_failed(block, now, e)
+                continue
+            finally:
+                decode_duration += time.perf_counter() - decode_start
+            for name in block.names:
+                self._expires[name] = now + self._value_lifetime[name]
+            if breaker is not None:
+                breaker.record_success()
+        return decode_duration
+
+    def close(self):
+        """Stop any running poll cycle and close a private connection."""
+        self._closed = True
+        if self._owns_connection:
+            self.connection.close()
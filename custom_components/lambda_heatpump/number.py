@@ -0,0 +1,80 @@
+"""Number entities for writable Lambda Heatpump setpoints."""
+import logging
+
+from homeassistant.components.number import NumberEntity
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import DOMAIN
+from .lambda_heatpump_api import decode_value, encode_value
+from .sensor import device_info, sensor_unique_id, writable_sensors
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_entry(hass, entry, async_add_entities):
+    """Set up Lambda Heatpump setpoints."""
+    runtime = hass.data[DOMAIN][entry.entry_id]
+    if "write_queue" not in runtime:
+        # Die Sensor-Plattform konnte nicht eingerichtet werden
+        return
+    async_add_entities(
+        LambdaHeatpumpNumber(
+            runtime["coordinator"], runtime["write_queue"], entry.entry_id, sensor, runtime["register_map"].model
+        )
+        for sensor in writable_sensors(runtime["sensors"])
+        if not sensor.get("description_map")
+    )
+
+
+class LambdaHeatpumpNumber(CoordinatorEntity, NumberEntity):
+    """Writable setpoint of the heat pump.
+
+    Until the next poll cycle has read the register back, the entity shows
+    the value that was written.
+    """
+
+    def __init__(self, coordinator, write_queue, entry_id, sensor, model):
+        """Initialize the setpoint."""
+        super().__init__(coordinator)
+        self._write_queue = write_queue
+        self._sensor = sensor
+        self._key = sensor["name"]
+        self._register = sensor["register"]
+
+        self._attr_name = sensor["name"]
+        self._attr_unique_id = sensor_unique_id(entry_id, sensor)
+        self._attr_native_unit_of_measurement = sensor["unit"] or None
+        self._attr_device_class = sensor.get("device_class")
+        self._attr_native_min_value = sensor["write"]["min"]
+        self._attr_native_max_value = sensor["write"]["max"]
+        self._attr_native_step = sensor["write"].get("step", sensor.get("scale", 1))
+        self._attr_device_info = device_info(entry_id, sensor["device"], model)
+        self._last_value = self.native_value
+        self._last_available = coordinator.last_update_success
+
+    @property
+    def native_value(self):
+        """Return the written value until it is read back, otherwise the polled one."""
+        expected = self._write_queue.expected(self._register)
+        if expected is not None:
+            return decode_value(self._sensor, expected)
+        value = (self.coordinator.data or {}).get(self._key)
+        return None if value == 0x8000 else value
+
+    async def async_set_native_value(self, value):
+        """Queue the new setpoint."""
+        self._write_queue.write(self._register, encode_value(self._sensor, value))
+        self._last_value = self.native_value
+        self.async_write_ha_state()
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Write the state only if the shown value or availability changed."""
+        value = self.native_value
+        available = self.available
+        if value == self._last_value and available == self._last_available:
+            return
+        self._last_value = value
+        self._last_available = available
+        self.async_write_ha_state()
@@ -0,0 +1,130 @@
+"""Local Modbus TCP proxy serving the registers polled by the integration."""
+import logging
+import time
+
+from pymodbus.datastore import ModbusBaseDeviceContext, ModbusServerContext
+from pymodbus.exceptions import ModbusException
+from pymodbus.pdu import ExceptionResponse
+from pymodbus.pdu.register_message import ReadHoldingRegistersRequest
+from pymodbus.server import ModbusTcpServer
+
+from .lambda_heatpump_api import DEFAULT_PROXY_HOST, DEFAULT_PROXY_MAX_AGE
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CachedRegisterContext(ModbusBaseDeviceContext):
+    """Answer reads from the connection's register cache, forward misses and queue writes.
+
+    Registers with a queued or not yet confirmed write are answered with
+    the written value, so write echoes and reads right after a write show
+    the new value instead of the cached old one.
+    """
+
+    def __init__(self, connection, write_queue, max_age=DEFAULT_PROXY_MAX_AGE):
+        self.connection = connection
+        self.write_queue = write_queue
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.unavailable = 0
+
+    def reset(self):
+        """Reset the request statistics."""
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.unavailable = 0
+
+    def cached(self, address, count):
+        """Return the cached registers if they are fresh enough, else None."""
+        return self.connection.cache.get(address, count, self.max_age, time.monotonic())
+
+    async def async_getValues(self, fc_as_hex, address, count=1):
+        """Return ``count`` holding registers, reading the controller only on a cache miss."""
+        if self.decode(fc_as_hex) != "h":
+            raise ValueError(f"function code {fc_as_hex} is not supported")
+        registers = self.cached(address, count)
+        if registers is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            result = await self.connection.read_holding_registers(address, count=count)
+            if result.isError():
+                raise ModbusException(f"controller rejected read of {count} registers at {address}: {result}")
+            registers = result.registers
+        return [
+            value if (expected := self.write_queue.expected(register)) is None else expected
+            for register, value in enumerate(registers, address)
+        ]
+
+    async def async_setValues(self, fc_as_hex, address, values):
+        """Queue a write for the controller.
+
+        The write is acknowledged once it is queued; like writes from Home
+        Assistant it is coalesced, rate-limited and verified by the next
+        poll cycle.
+        """
+        if self.decode(fc_as_hex) != "h":
+            return ExceptionResponse.ILLEGAL_FUNCTION
+        self.writes += 1
+        for register, value in enumerate(values, address):
+            self.write_queue.write(register, value)
+        return None
+
+    def as_dict(self):
+        """Return the proxy statistics for diagnostics."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "unavailable": self.unavailable,
+            "max_age": self.max_age,
+        }
+
+
+class _UnavailableResponse(ExceptionResponse):
+    """Exception response that replaces a request before it reaches the datastore."""
+
+    def __init__(self, request):
+        super().__init__(request.function_code, ExceptionResponse.GATEWAY_PATH_UNAVIABLE, request.dev_id, request.transaction_id)
+
+    async def update_datastore(self, context):
+        """Answer with this exception response."""
+        return self
+
+
+class LambdaModbusProxy(ModbusTcpServer):
+    """Modbus TCP server sharing one controller session with other local clients.
+
+    EVCC, PV surplus controllers and the like can read the same registers
+    as Home Assistant without opening sessions of their own. Every device
+    id is answered.
+    """
+
+    def __init__(self, connection, write_queue, port, host=DEFAULT_PROXY_HOST, max_age=DEFAULT_PROXY_MAX_AGE):
+        self.device = CachedRegisterContext(connection, write_queue, max_age)
+        super().__init__(
+            ModbusServerContext(devices=self.device, single=True),
+            address=(host, port),
+            trace_pdu=self._trace_pdu,
+        )
+
+    def _trace_pdu(self, sending, pdu):
+        """Reject reads the cache cannot serve while the controller session is down.
+
+        Otherwise the forwarded read would fail and pymodbus would log a
+        traceback for every such request.
+        """
+        if sending or pdu.function_code != ReadHoldingRegistersRequest.function_code:
+            return pdu
+        if self.device.connection.connected or self.device.cached(pdu.address, pdu.count) is not None:
+            return pdu
+        self.device.unavailable += 1
+        return _UnavailableResponse(pdu)
+
+    async def async_start(self):
+        """Start serving in the background."""
+        await self.serve_forever(background=True)
+        _LOGGER.info("Lambda Modbus proxy listening on %s:%s", *self.comm_params.source_address)
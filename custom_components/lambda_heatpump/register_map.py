@@ -0,0 +1,420 @@
+"""Register maps of the Lambda controller models.
+
+Every model or firmware variant is described by a JSON file in
+``register_maps/``; adding one does not need any code change. A file is
+parsed and validated once per process into immutable, slotted
+``SensorDescriptor`` objects that all config entries share.
+
+File format (``format_version`` 1):
+
+- ``model``: model name shown in the device info, ``firmware``: optional
+  firmware description of a variant.
+- ``extends``: optional key of another map; sensors with the same name
+  replace the inherited ones, all others are added.
+- ``enums``: named state texts, referenced by sensors via ``"enum"``.
+- ``general``: sensors with an absolute ``register`` and a ``device``.
+- ``modules``: one template per module type of ``MODULES``. ``offset`` is
+  relative to the first register of an instance, ``name``/``device`` are
+  formatted with the instance number, ``first_name``/``first_device``
+  apply to instance 1 if they differ.
+
+Sensor keys: ``unit`` (default ""), ``scale`` (1), ``precision`` (0),
+``data_type`` (int16/uint16/int32, int32 with two registers, the first
+one the LOW word), ``poll_tier`` (fast/normal/slow, default normal),
+``word_order`` (int32 only), ``state_class``, ``device_class``,
+``deadband``/``deadband_percent`` (override the deadband of the device
+class or unit) and ``write`` (writable with min/max/step, with an enum
+as select).
+"""
+from collections.abc import Mapping
+import functools
+import json
+import logging
+import os
+import re
+import sys
+from types import MappingProxyType
+
+from .lambda_heatpump_api import MODULE_STRIDE, MODULES, POLL_TIER_FAST, POLL_TIER_NORMAL, POLL_TIER_SLOW
+
+_LOGGER = logging.getLogger(__name__)
+
+REGISTER_MAP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "register_maps")
+DEFAULT_REGISTER_MAP = "eureka_luft"
+FORMAT_VERSION = 1
+
+# struct-Format je Datentyp, siehe BlockDecoder
+STRUCT_FORMATS = {"int16": "h", "uint16": "H", "int32": "HH"}
+POLL_TIERS = (POLL_TIER_FAST, POLL_TIER_NORMAL, POLL_TIER_SLOW)
+WORD_ORDERS = ("auto", "low_high", "high_low")
+
+_KEY_PATTERN = re.compile(r"^[a-z0-9_]+$")
+_SENSOR_KEYS = frozenset({
+    "name", "unit", "scale", "precision", "data_type", "poll_tier", "state_class", "device_class",
+    "enum", "description_map", "word_order", "write", "deadband", "deadband_percent",
+})
+_TEMPLATE_KEYS = frozenset({"name", "first_name", "device", "first_device", "sensors"})
+_WRITE_KEYS = frozenset({"min", "max", "step"})
+
+# Zustandstexte werden prozessweit nur einmal gehalten
+_ENUMS = {}
+
+
+def _intern_enum(values):
+    """Return the shared tuple of a list of state texts."""
+    values = tuple(sys.intern(value) for value in values)
+    return _ENUMS.setdefault(values, values)
+
+
+class SensorDescriptor(Mapping):
+    """Immutable description of one sensor of a register map.
+
+    Descriptors behave like the read-only sensor dicts used throughout the
+    integration (``sensor["name"]``, ``sensor.get("poll_tier")``); keys
+    without a value are absent. ``span`` and ``struct_format`` are
+    precomputed for the read planner and the block decoder.
+    """
+
+    _FIELDS = (
+        "name", "register", "device", "unit", "scale", "precision", "data_type", "poll_tier", "state_class",
+        "device_class", "description_map", "word_order", "write", "deadband", "deadband_percent",
+    )
+    __slots__ = _FIELDS + ("span", "struct_format")
+
+    def __init__(self, name, register, device, data_type, unit="", scale=1, precision=0, poll_tier=POLL_TIER_NORMAL,
+                 state_class=None, device_class=None, description_map=None, word_order=None, write=None,
+                 deadband=None, deadband_percent=None):
+        values = {
+            "name": name,
+            "register": register,
+            "device": device,
+            "unit": unit,
+            "scale": scale,
+            "precision": precision,
+            "data_type": data_type,
+            "poll_tier": poll_tier,
+            "state_class": state_class,
+            "device_class": device_class,
+            "description_map": description_map,
+            "word_order": word_order or ("auto" if data_type == "int32" else None),
+            "write": write,
+            "deadband": deadband,
+            "deadband_percent": deadband_percent,
+            "span": (register[0], register[1]) if isinstance(register, tuple) else (register, register),
+            "struct_format": STRUCT_FORMATS[data_type],
+        }
+        for key, value in values.items():
+            object.__setattr__(self, key, value)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __getitem__(self, key):
+        if key not in self._FIELDS:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return (key for key in self._FIELDS if getattr(self, key) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __hash__(self):
+        return hash((self.name, self.register))
+
+    def __repr__(self):
+        return f"SensorDescriptor({self.name!r}, register={self.register!r})"
+
+
+class ModuleTemplate:
+    """Sensor template of one module type, expanded once per installed instance."""
+
+    __slots__ = ("name", "first_name", "device", "first_device", "sensors")
+
+    def __init__(self, name, device, sensors, first_name=None, first_device=None):
+        self.name = name
+        self.first_name = first_name or name
+        self.device = device
+        self.first_device = first_device or device
+        # (offset, Schlüsselwörter für SensorDescriptor) je Sensor
+        self.sensors = sensors
+
+
+class RegisterMap:
+    """Validated register map of one controller model or firmware variant."""
+
+    __slots__ = ("key", "model", "firmware", "general", "modules", "_expanded")
+
+    def __init__(self, key, model, firmware, general, modules):
+        self.key = key
+        self.model = model
+        self.firmware = firmware
+        self.general = general
+        self.modules = modules
+        self._expanded = {}
+
+    @property
+    def label(self):
+        """Return the model name including the firmware variant."""
+        return f"{self.model} ({self.firmware})" if self.firmware else self.model
+
+    def expand(self, modules):
+        """Return the sensors of a module topology.
+
+        ``modules`` maps each module type to its installed instance numbers.
+        Entries with the same topology share the same descriptors.
+        """
+        topology = tuple((module, tuple(modules.get(module, ()))) for module in self.modules)
+        sensors = self._expanded.get(topology)
+        if sensors is None:
+            sensors = self._expanded[topology] = self._expand(topology)
+        return sensors
+
+    def _expand(self, topology):
+        sensors = list(self.general)
+        for module, indexes in topology:
+            template = self.modules[module]
+            base = MODULES[module][0]
+            for index in indexes:
+                start = base + (index - 1) * MODULE_STRIDE
+                prefix = (template.first_name if index == 1 else template.name).format(index=index)
+                device = sys.intern((template.first_device if index == 1 else template.device).format(index=index))
+                for offset, fields in template.sensors:
+                    sensors.append(SensorDescriptor(
+                        name=f"{prefix} {fields['name']}",
+                        register=tuple(start + o for o in offset) if isinstance(offset, tuple) else start + offset,
+                        device=device,
+                        **{key: value for key, value in fields.items() if key != "name"},
+                    ))
+        return tuple(sensors)
+
+
+def _read_document(key):
+    """Read the raw JSON document of a register map."""
+    if not _KEY_PATTERN.match(key):
+        raise ValueError(f"invalid register map name {key!r}")
+    with open(os.path.join(REGISTER_MAP_DIR, f"{key}.json"), encoding="utf-8") as file:
+        document = json.load(file)
+    if not isinstance(document, dict):
+        raise ValueError(f"{key}.json is not a JSON object")
+    if document.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"{key}.json has unsupported format_version {document.get('format_version')!r}")
+    return document
+
+
+def _merge_sensors(inherited, sensors):
+    """Replace inherited sensors by name and append new ones."""
+    merged = {sensor.get("name"): sensor for sensor in inherited}
+    merged.update((sensor.get("name"), sensor) for sensor in sensors)
+    return list(merged.values())
+
+
+def _resolve_document(key, seen=()):
+    """Read a register map and merge it into the map it extends."""
+    if key in seen:
+        raise ValueError(f"{key}.json extends itself")
+    document = _read_document(key)
+    parent_key = document.get("extends")
+    if parent_key is None:
+        return document
+    parent = _resolve_document(parent_key, (*seen, key))
+    modules = {module: dict(template) for module, template in parent.get("modules", {}).items()}
+    for module, template in document.get("modules", {}).items():
+        inherited = modules.get(module, {})
+        modules[module] = {
+            **inherited,
+            **template,
+            "sensors": _merge_sensors(inherited.get("sensors", []), template.get("sensors", [])),
+        }
+    return {
+        "format_version": FORMAT_VERSION,
+        "model": document.get("model", parent.get("model")),
+        "firmware": document.get("firmware", parent.get("firmware")),
+        "enums": {**parent.get("enums", {}), **document.get("enums", {})},
+        "general": _merge_sensors(parent.get("general", []), document.get("general", [])),
+        "modules": modules,
+    }
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _parse_sensor(sensor, enums, position_key, position_range):
+    """Validate one sensor entry and return (position, descriptor fields)."""
+    if not isinstance(sensor, dict):
+        raise ValueError(f"sensor entry {sensor!r} is not an object")
+    name = sensor.get("name")
+    if not isinstance(name, str) or not name:
+        raise ValueError(f"sensor entry {sensor!r} has no name")
+    unknown = set(sensor) - _SENSOR_KEYS - {position_key, "device"}
+    if unknown:
+        raise ValueError(f"{name}: unknown keys {sorted(unknown)}")
+
+    data_type = sensor.get("data_type")
+    if data_type not in STRUCT_FORMATS:
+        raise ValueError(f"{name}: data_type must be one of {sorted(STRUCT_FORMATS)}")
+    position = sensor.get(position_key)
+    if data_type == "int32":
+        if not (isinstance(position, list) and len(position) == 2 and all(isinstance(p, int) for p in position)):
+            raise ValueError(f"{name}: int32 needs two registers in '{position_key}'")
+        position = tuple(position)
+        # Die Decoder lesen immer das LOW-Wort zuerst
+        if position[1] != position[0] + 1:
+            raise ValueError(f"{name}: int32 registers must be adjacent and ascending (LOW word first)")
+    elif not isinstance(position, int) or isinstance(position, bool):
+        raise ValueError(f"{name}: '{position_key}' must be a register number")
+    for register in position if isinstance(position, tuple) else (position,):
+        if register not in position_range:
+            raise ValueError(f"{name}: {position_key} {register} is out of range")
+
+    fields = {"name": name, "data_type": sys.intern(data_type)}
+    for key in ("unit", "state_class", "device_class"):
+        if key in sensor:
+            if not isinstance(sensor[key], str):
+                raise ValueError(f"{name}: {key} must be a string")
+            fields[key] = sys.intern(sensor[key])
+    if "scale" in sensor:
+        if not _is_number(sensor["scale"]) or not sensor["scale"]:
+            raise ValueError(f"{name}: scale must be a non-zero number")
+        fields["scale"] = sensor["scale"]
+    if "precision" in sensor:
+        if not isinstance(sensor["precision"], int) or sensor["precision"] < 0:
+            raise ValueError(f"{name}: precision must be a non-negative integer")
+        fields["precision"] = sensor["precision"]
+    if "poll_tier" in sensor:
+        if sensor["poll_tier"] not in POLL_TIERS:
+            raise ValueError(f"{name}: poll_tier must be one of {POLL_TIERS}")
+        fields["poll_tier"] = sys.intern(sensor["poll_tier"])
+    if "word_order" in sensor:
+        if data_type != "int32" or sensor["word_order"] not in WORD_ORDERS:
+            raise ValueError(f"{name}: word_order must be one of {WORD_ORDERS} and is only valid for int32")
+        fields["word_order"] = sys.intern(sensor["word_order"])
+    for key in ("deadband", "deadband_percent"):
+        if key in sensor:
+            if not _is_number(sensor[key]) or sensor[key] < 0:
+                raise ValueError(f"{name}: {key} must be a non-negative number")
+            fields[key] = sensor[key]
+
+    if "enum" in sensor and "description_map" in sensor:
+        raise ValueError(f"{name}: use either 'enum' or 'description_map'")
+    if "enum" in sensor:
+        if sensor["enum"] not in enums:
+            raise ValueError(f"{name}: unknown enum {sensor['enum']!r}")
+        fields["description_map"] = enums[sensor["enum"]]
+    elif "description_map" in sensor:
+        fields["description_map"] = _parse_enum(name, sensor["description_map"])
+
+    if "write" in sensor:
+        write = sensor["write"]
+        if not isinstance(write, dict) or set(write) - _WRITE_KEYS:
+            raise ValueError(f"{name}: write may only contain {sorted(_WRITE_KEYS)}")
+        if "description_map" not in fields:
+            if not (_is_number(write.get("min")) and _is_number(write.get("max")) and write["min"] <= write["max"]):
+                raise ValueError(f"{name}: write needs numeric min <= max")
+            if "step" in write and (not _is_number(write["step"]) or write["step"] <= 0):
+                raise ValueError(f"{name}: write step must be positive")
+        fields["write"] = MappingProxyType(dict(write))
+    return position, fields
+
+
+def _parse_enum(name, values):
+    if not isinstance(values, list) or not values or not all(isinstance(value, str) for value in values):
+        raise ValueError(f"{name}: state texts must be a non-empty list of strings")
+    return _intern_enum(values)
+
+
+def _check_overlaps(sensors, where):
+    """Reject duplicate names and sensors sharing a register."""
+    names = set()
+    registers = set()
+    for position, fields in sensors:
+        if fields["name"] in names:
+            raise ValueError(f"{where}: duplicate sensor {fields['name']!r}")
+        names.add(fields["name"])
+        for register in position if isinstance(position, tuple) else (position,):
+            if register in registers:
+                raise ValueError(f"{where}: register {register} is used twice")
+            registers.add(register)
+
+
+def _build_register_map(key, document):
+    """Validate a resolved document and build its descriptors."""
+    model = document.get("model")
+    if not isinstance(model, str) or not model:
+        raise ValueError("model is missing")
+    firmware = document.get("firmware")
+    if firmware is not None and not isinstance(firmware, str):
+        raise ValueError("firmware must be a string")
+
+    enums = {name: _parse_enum(f"enum {name}", values) for name, values in document.get("enums", {}).items()}
+
+    general = []
+    for sensor in document.get("general", []):
+        register, fields = _parse_sensor(sensor, enums, "register", range(0x10000))
+        if not isinstance(sensor.get("device"), str):
+            raise ValueError(f"{fields['name']}: general sensors need a device")
+        general.append((register, fields, sys.intern(sensor["device"])))
+    _check_overlaps([(register, fields) for register, fields, _ in general], "general")
+
+    modules = {}
+    for module, template in document.get("modules", {}).items():
+        if module not in MODULES:
+            raise ValueError(f"unknown module {module!r}, expected one of {sorted(MODULES)}")
+        if set(template) - _TEMPLATE_KEYS or not all(isinstance(template.get(k), str) for k in ("name", "device")):
+            raise ValueError(f"module {module}: needs name and device and may only contain {sorted(_TEMPLATE_KEYS)}")
+        sensors = []
+        for sensor in template.get("sensors", []):
+            if "device" in sensor:
+                raise ValueError(f"module {module}: {sensor.get('name')} must not set a device")
+            sensors.append(_parse_sensor(sensor, enums, "offset", range(MODULE_STRIDE)))
+        _check_overlaps(sensors, f"module {module}")
+        modules[module] = ModuleTemplate(
+            template["name"],
+            template["device"],
+            tuple(sensors),
+            template.get("first_name"),
+            template.get("first_device"),
+        )
+
+    return RegisterMap(
+        key,
+        model,
+        firmware,
+        tuple(
+            SensorDescriptor(register=register, device=device, **fields)
+            for register, fields, device in general
+        ),
+        modules,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def load_register_map(key=DEFAULT_REGISTER_MAP):
+    """Load, validate and cache the register map ``key`` (file name without ``.json``).
+
+    Raises ``ValueError`` for an invalid map and ``OSError`` if it does not
+    exist. Does blocking I/O on the first call for a map.
+    """
+    try:
+        return _build_register_map(key, _resolve_document(key))
+    except ValueError as e:
+        raise ValueError(f"Register map {key}: {e}") from e
+
+
+def available_register_maps():
+    """Return {key: label} of all valid register maps, skipping broken files."""
+    maps = {}
+    for filename in sorted(os.listdir(REGISTER_MAP_DIR)):
+        key, extension = os.path.splitext(filename)
+        if extension != ".json":
+            continue
+        try:
+            maps[key] = load_register_map(key).label
+        except (OSError, ValueError) as e:
+            _LOGGER.error("Skipping register map %s: %s", filename, e)
+    return maps
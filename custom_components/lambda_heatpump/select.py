@@ -0,0 +1,71 @@
+"""Select entities for writable Lambda Heatpump operating modes."""
+import logging
+
+from homeassistant.components.select import SelectEntity
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import DOMAIN
+from .sensor import device_info, sensor_unique_id, writable_sensors
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_entry(hass, entry, async_add_entities):
+    """Set up Lambda Heatpump operating modes."""
+    runtime = hass.data[DOMAIN][entry.entry_id]
+    if "write_queue" not in runtime:
+        # Die Sensor-Plattform konnte nicht eingerichtet werden
+        return
+    async_add_entities(
+        LambdaHeatpumpSelect(
+            runtime["coordinator"], runtime["write_queue"], entry.entry_id, sensor, runtime["register_map"].model
+        )
+        for sensor in writable_sensors(runtime["sensors"])
+        if sensor.get("description_map")
+    )
+
+
+class LambdaHeatpumpSelect(CoordinatorEntity, SelectEntity):
+    """Writable operating mode of the heat pump."""
+
+    def __init__(self, coordinator, write_queue, entry_id, sensor, model):
+        """Initialize the operating mode."""
+        super().__init__(coordinator)
+        self._write_queue = write_queue
+        self._key = sensor["name"]
+        self._register = sensor["register"]
+
+        self._attr_name = sensor["name"]
+        self._attr_unique_id = sensor_unique_id(entry_id, sensor)
+        self._attr_options = list(sensor["description_map"])
+        self._attr_device_info = device_info(entry_id, sensor["device"], model)
+        self._last_option = self.current_option
+        self._last_available = coordinator.last_update_success
+
+    @property
+    def current_option(self):
+        """Return the selected option until it is read back, otherwise the polled one."""
+        index = self._write_queue.expected(self._register)
+        if index is None:
+            index = (self.coordinator.data or {}).get(self._key)
+        if index is None or not 0 <= index < len(self._attr_options):
+            return None
+        return self._attr_options[int(index)]
+
+    async def async_select_option(self, option):
+        """Queue the new operating mode."""
+        self._write_queue.write(self._register, self._attr_options.index(option))
+        self._last_option = option
+        self.async_write_ha_state()
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Write the state only if the shown option or availability changed."""
+        option = self.current_option
+        available = self.available
+        if option == self._last_option and available == self._last_available:
+            return
+        self._last_option = option
+        self._last_available = available
+        self.async_write_ha_state()
@@ -1,390 +1,419 @@
 """Sensor handling for Lambda Heatpump."""
 from datetime import timedelta
 import logging
-from pymodbus.client import ModbusTcpClient
-from pymodbus import __version__ as pymodbus_version
-from homeassistant.helpers.entity import Entity
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-from . import DOMAIN
+import time
+from homeassistant.components.sensor import SensorEntity
+from homeassistant.const import EntityCategory
+from homeassistant.core import callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.update_coordinator import CoordinatorEntity, DataUpdateCoordinator
+from . import snapshot_store
+from .capture import CaptureWriter
+from .const import (
+    CONF_CAPTURE,
+    CONF_CAPTURE_MAX_SIZE,
+    CONF_FAST_UPDATE_INTERVAL,
+    CONF_HEARTBEAT,
+    CONF_MAX_REGISTER_GAP,
+    CONF_MAX_VALUE_AGE,
+    CONF_MODULES,
+    CONF_RELATIVE_DEADBAND,
+    CONF_SAMPLED_SENSORS,
+    CONF_SAMPLING_INTERVAL,
+    CONF_SLOW_UPDATE_INTERVAL,
+    CONF_TEMPERATURE_DEADBAND,
+    CONF_UPDATE_INTERVAL,
+    DOMAIN,
+)
+from .lambda_heatpump_api import (
+    DEFAULT_CAPTURE_MAX_SIZE,
+    DEFAULT_HEARTBEAT,
+    DEFAULT_MAX_REGISTER_GAP,
+    DEFAULT_MAX_VALUE_AGE,
+    DEFAULT_POLL_INTERVALS,
+    DEFAULT_SAMPLING_INTERVAL,
+    POLL_TIER_FAST,
+    POLL_TIER_NORMAL,
+    POLL_TIER_SLOW,
+    DeadbandFilter,
+    HighRateSampler,
+    ModbusClientManager,
+    WriteQueue,
+)
+from .register_map import DEFAULT_REGISTER_MAP, load_register_map
 
 _LOGGER = logging.getLogger(__name__)
 
-# Liste aller auslesbaren Register
-SENSORS = [
-    # General Ambient
-    {"name": "Ambient Error Number", "register": 0, "unit": "", "scale": 1, "precision": 0, "data_type": "int16", "state_class": "total"},
-    {"name": "Ambient Operating State", "register": 1, "unit": "", "scale": 1, "precision": 0, "data_type": "uint16", "state_class": "total",
-     "description_map": ["Off", "Automatik", "Manual", "Error"]},
-    {"name": "Ambient Temperature", "register": 2, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Ambient Temperature 1h", "register": 3, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Ambient Temperature Calculated", "register": 4, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-
-    # General E-Manager
-    {"name": "E-Manager Error Number", "register": 100, "unit": "", "scale": 1, "precision": 0, "data_type": "int16", "state_class": "total"},
-    {"name": "E-Manager Operating State", "register": 101, "unit": "", "scale": 1, "precision": 0, "data_type": "uint16", "state_class": "total",
-     "description_map": ["Off", "Automatik", "Manual", "Error", "Offline"]},
-    {"name": "E-Manager Actual Power", "register": 102, "unit": "W", "scale": 1, "precision": 0, "data_type": "int16", "state_class": "total"},
-    {"name": "E-Manager Actual Power Consumption", "register": 103, "unit": "W", "scale": 1, "precision": 0, "data_type": "int16", "state_class": "total"},
-    {"name": "E-Manager Power Consumption Setpoint", "register": 104, "unit": "W", "scale": 1, "precision": 0, "data_type": "int16", "state_class": "total"},
-
-    # Heat Pump No. 1
-    {"name": "Heat Pump 1 Error State", "register": 1000, "unit": "", "scale": 1, "precision": 0, "data_type": "uint16", "state_class": "total",
-     "description_map": ["OK", "Message", "Warnung", "Alarm", "Fault"]},
-    {"name": "Heat Pump 1 Error Number", "register": 1001, "unit": "", "scale": 1, "precision": 0, "data_type": "int16", "state_class": "total"},
-    {"name": "Heat Pump 1 State", "register": 1002, "unit": "", "scale": 1, "precision": 0, "data_type": "uint16", "state_class": "total",
-     "description_map": ["Init", "Reference", "Restart-Block", "Ready", "Start Pumps", "Start Compressor", "Pre-Regulation", "Regulation",
-                         "Not Used", "Cooling", "Defrosting", "Not Used", "Not Used", "Not Used", "Not Used", "Not Used", "Not Used",
-                         "Not Used", "Not Used", "Not Used", "Stopping", "Not Used", "Not Used", "Not Used", "Not Used", "Not Used",
-                         "Not Used", "Not Used", "Not Used", "Not Used", "Not Used", "Fault-Lock", "Alarm-Block", "Not Used", "Not Used",
-                         "Not Used", "Not Used", "Not Used", "Not Used", "Error-Reset"]},
-    {"name": "Heat Pump 1 Operating State", "register": 1003, "unit": "", "scale": 1, "precision": 0, "data_type": "uint16", "state_class": "total",
-     "description_map": ["Standby", "Central Heating", "Domestic Hot Water", "Cold Climate", "Circulate", "Defrost", "Off", "Frost",
-                         "Standby-Frost", "Not used", "Summer", "Holiday", "Error", "Warning", "Info-Message", "Time-Block", "Release-Block",
-                         "Mintemp-Block", "Firmware-Download"]},
-    {"name": "Heat Pump 1 Flow Line Temperature", "register": 1004, "unit": "°C", "scale": 0.01, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heat Pump 1 Return Line Temperature", "register": 1005, "unit": "°C", "scale": 0.01, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heat Pump 1 Volume Flow Heat Sink", "register": 1006, "unit": "l/h", "scale": 1, "precision": 1, "data_type": "int16", "state_class": "total"},
-    {"name": "Heat Pump 1 Energy Source Inlet Temperature", "register": 1007, "unit": "°C", "scale": 0.01, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heat Pump 1 Energy Source Outlet Temperature", "register": 1008, "unit": "°C", "scale": 0.01, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heat Pump 1 Volume Flow Energy Source", "register": 1009, "unit": "l/min", "scale": 0.01, "precision": 1, "data_type": "int16", "state_class": "measurement"},
-    {"name": "Heat Pump 1 Compressor Unit Rating", "register": 1010, "unit": "%", "scale": 0.01, "precision": 0, "data_type": "uint16", "state_class": "total"},
-    {"name": "Heat Pump 1 Actual Heating Capacity", "register": 1011, "unit": "kW", "scale": 0.1, "precision": 1, "data_type": "int16", "state_class": "measurement"},
-    {"name": "Heat Pump 1 Inverter Power Consumption", "register": 1012, "unit": "W", "scale": 1, "precision": 0, "data_type": "int16", "state_class": "total"},
-    {"name": "Heat Pump 1 COP", "register": 1013, "unit": "", "scale": 0.01, "precision": 2, "data_type": "int16", "state_class": "total"},
-    {"name": "Heat Pump 1 Request Type", "register": 1015, "unit": "", "scale": 1, "precision": 0, "data_type": "int16", "state_class": "total",
-     "description_map": ["No Request", "Flow Pump Circulation", "Central Heating", "Central Cooling", "Domestic Hot Water"]},
-    {"name": "Heat Pump 1 Requested Flow Line Temperature", "register": 1016, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heat Pump 1 Requested Return Line Temperature", "register": 1017, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heat Pump 1 Requested Flow to Return Line Temperature Difference", "register": 1018, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heat Pump 1 Relais State 2nd Heating Stage", "register": 1019, "unit": "", "scale": 1, "precision": 0, "data_type": "int16", "state_class": "total"},
-    {"name": "Heat Pump 1 Compressor Power Consumption Accumulated", "register": [1020, 1021], "unit": "Wh", "scale": 1, "precision": 0, "data_type": "int32", "device_class": "energy", "state_class": "total_increasing"},
-    {"name": "Heat Pump 1 Compressor Thermal Energy Output Accumulated", "register": [1022, 1023], "unit": "Wh", "scale": 1, "precision": 0, "data_type": "int32", "device_class": "energy", "state_class": "total_increasing"},
-
-    # Boiler
-    {"name": "Boiler Error Number", "register": 2000, "unit": "", "scale": 1, "precision": 0, "data_type": "int16", "state_class": "total"},
-    {"name": "Boiler Operating State", "register": 2001, "unit": "", "scale": 1, "precision": 0, "data_type": "uint16", "state_class": "total",
-     "description_map": ["Standby", "Domestic Hot Water", "Legio", "Summer", "Frost", "Holiday", "Prio-Stop", "Error", "Off", "Prompt-DHW",
-                         "Trailing-Stop", "Temp-Lock", "Standby-Frost"]},
-    {"name": "Boiler Actual High Temperature", "register": 2002, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Boiler Actual Low Temperature", "register": 2003, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Boiler Set Temperature", "register": 2050, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-
-    # Buffer
-    {"name": "Buffer Error Number", "register": 3000, "unit": "", "scale": 1, "precision": 0, "data_type": "int16", "state_class": "total"},
-    {"name": "Buffer Operating State", "register": 3001, "unit": "", "scale": 1, "precision": 0, "data_type": "uint16", "state_class": "total",
-     "description_map": ["Standby", "Heating", "Cooling", "Summer", "Frost", "Holiday", "Prio-Stop", "Error", "Off", "Standby-Frost"]},
-    {"name": "Buffer Actual High Temperature", "register": 3002, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Buffer Actual Low Temperature", "register": 3003, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Buffer Set Temperature", "register": 3050, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-
-    # Solar
-#    {"name": "Solar Error Number", "register": 4000, "unit": "", "scale": 1, "precision": 0, "data_type": "int16", "state_class": "total"},
-#    {"name": "Solar Operating State", "register": 4001, "unit": "", "scale": 1, "precision": 0, "data_type": "uint16", "state_class": "total",
-#     "description_map": ["Standby", "Heating", "Error", "Off"]},
-#    {"name": "Solar Actual Collector Temperature", "register": 4002, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-#    {"name": "Solar Actual Buffer Sensor 1 Temperature", "register": 4003, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-#    {"name": "Solar Actual Buffer Sensor 2 Temperature", "register": 4004, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-#    {"name": "Solar Set Max Buffer Temperature", "register": 4050, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-#    {"name": "Solar Set Buffer Changeover Temperature", "register": 4051, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-
-    # Heating Circuit 1
-    {"name": "Heating Circuit 1 Error Number", "register": 5000, "unit": "", "scale": 1, "precision": 0, "data_type": "int16", "state_class": "total"},
-    {"name": "Heating Circuit 1 Operating State", "register": 5001, "unit": "", "scale": 1, "precision": 0, "data_type": "uint16", "state_class": "total",
-     "description_map": ["Heating", "Eco", "Cooling", "Floor-dry", "Frost", "Max-Temp", "Error", "Service", "Holiday", "Central Heating Summer",
-                         "Central Cooling Winter", "Prio-Stop", "Off", "Release-Off", "Time-Off", "Standby", "Standby-Heating", "Standby-Eco",
-                         "Standby-Cooling", "Standby-Frost", "Standby-Floor-dry"]},
-    {"name": "Heating Circuit 1 Flow Line Temperature", "register": 5002, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heating Circuit 1 Return Line Temperature", "register": 5003, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heating Circuit 1 Room Device Temperature", "register": 5004, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heating Circuit 1 Set Flow Line Temperature", "register": 5005, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heating Circuit 1 Operating Mode", "register": 5006, "unit": "", "scale": 1, "precision": 0, "data_type": "int16", "state_class": "total",
-     "description_map": ["Off", "Manual", "Automatik", "Auto-Heating", "Auto-Cooling", "Frost", "Summer", "Floor-dry"]},
-    {"name": "Heating Circuit 1 Set Flow Line Offset Temperature", "register": 5050, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heating Circuit 1 Set Heating Mode Room Temperature", "register": 5051, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heating Circuit 1 Set Cooling Mode Room Temperature", "register": 5052, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-
-    # Heating Circuit 2
-    {"name": "Heating Circuit 2 Error Number", "register": 5100, "unit": "", "scale": 1, "precision": 0, "data_type": "int16", "state_class": "total"},
-    {"name": "Heating Circuit 2 Operating State", "register": 5101, "unit": "", "scale": 1, "precision": 0, "data_type": "uint16", "state_class": "total",
-     "description_map": ["Heating", "Eco", "Cooling", "Floor-dry", "Frost", "Max-Temp", "Error", "Service", "Holiday", "Central Heating Summer",
-                         "Central Cooling Winter", "Prio-Stop", "Off", "Release-Off", "Time-Off", "Standby", "Standby-Heating", "Standby-Eco",
-                         "Standby-Cooling", "Standby-Frost", "Standby-Floor-dry"]},
-    {"name": "Heating Circuit 2 Flow Line Temperature", "register": 5102, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heating Circuit 2 Return Line Temperature", "register": 5103, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heating Circuit 2 Room Device Temperature", "register": 5104, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heating Circuit 2 Set Flow Line Temperature", "register": 5105, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heating Circuit 2 Operating Mode", "register": 5106, "unit": "", "scale": 1, "precision": 0, "data_type": "int16", "state_class": "total",
-     "description_map": ["Off", "Manual", "Automatik", "Auto-Heating", "Auto-Cooling", "Frost", "Summer", "Floor-dry"]},
-    {"name": "Heating Circuit 2 Set Flow Line Offset Temperature", "register": 5150, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heating Circuit 2 Set Heating Mode Room Temperature", "register": 5151, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heating Circuit 2 Set Cooling Mode Room Temperature", "register": 5152, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-
-    # Heating Circuit 3
-    {"name": "Heating Circuit 3 Error Number", "register": 5200, "unit": "", "scale": 1, "precision": 0, "data_type": "int16", "state_class": "total"},
-    {"name": "Heating Circuit 3 Operating State", "register": 5201, "unit": "", "scale": 1, "precision": 0, "data_type": "uint16", "state_class": "total",
-     "description_map": ["Heating", "Eco", "Cooling", "Floor-dry", "Frost", "Max-Temp", "Error", "Service", "Holiday", "Central Heating Summer",
-                         "Central Cooling Winter", "Prio-Stop", "Off", "Release-Off", "Time-Off", "Standby", "Standby-Heating", "Standby-Eco",
-                         "Standby-Cooling", "Standby-Frost", "Standby-Floor-dry"]},
-    {"name": "Heating Circuit 3 Flow Line Temperature", "register": 5202, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heating Circuit 3 Return Line Temperature", "register": 5203, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heating Circuit 3 Room Device Temperature", "register": 5204, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heating Circuit 3 Set Flow Line Temperature", "register": 5205, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heating Circuit 3 Operating Mode", "register": 5206, "unit": "", "scale": 1, "precision": 0, "data_type": "int16", "state_class": "total",
-     "description_map": ["Off", "Manual", "Automatik", "Auto-Heating", "Auto-Cooling", "Frost", "Summer", "Floor-dry"]},
-    {"name": "Heating Circuit 3 Set Flow Line Offset Temperature", "register": 5250, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heating Circuit 3 Set Heating Mode Room Temperature", "register": 5251, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-    {"name": "Heating Circuit 3 Set Cooling Mode Room Temperature", "register": 5252, "unit": "°C", "scale": 0.1, "precision": 1, "data_type": "int16", "device_class": "temperature", "state_class": "measurement"},
-]
+# Abstand (Sekunden), in dem die letzten Messwerte für einen schnellen Neustart gesichert werden
+SNAPSHOT_SAVE_INTERVAL = 300
 
-REGISTER_BLOCKS = [
-    (0, 4),       # General Ambient: Register 0 bis 4
-    (100, 104),   # E-Manager: Register 100 bis 104
-    (1000, 1019), # Heat Pump No. 1: Register 1000 bis 1019
-    (1020, 1023), # Heat Pump No. 1 (int32): Register 1020 bis 1023
-    (2000, 2003), # Boiler: Register 2000 bis 2003
-    (2050, 2050), # Boiler: Register 2050
-    (3000, 3003), # Buffer: Register 3000 bis 3003
-    (3050, 3050), # Buffer: Register 3050
-    (5000, 5006), # Heating Circuit 1: Register 5000 bis 5006
-    (5050, 5052), # Heating Circuit 1: Register 5050 bis 5052
-]
+# Verzeichnis (im Konfigurationsordner) der Registermitschnitte, eine Datei je Eintrag
+CAPTURE_DIRECTORY = f"{DOMAIN}_captures"
 
-REGISTER_BLOCKS_CIRCUIT_2 = [
-        (5100, 5106), # Heating Circuit 2
-        (5150, 5152), # Heating Circuit 2
-]
+# Topologie einer Standardinstallation
+DEFAULT_MODULES = {"heat_pump": [1], "boiler": [1], "buffer": [1], "solar": [], "heating_circuit": [1, 2, 3]}
+
+
+def expand_sensors(modules, register_map=None):
+    """Return the flat sensor list of a module topology.
+
+    ``modules`` maps each module type to its installed instance numbers;
+    ``register_map`` defaults to the map of DEFAULT_REGISTER_MAP. Every
+    sensor has its absolute ``register`` and the ``device`` it belongs to.
+    """
+    if register_map is None:
+        register_map = load_register_map(DEFAULT_REGISTER_MAP)
+    return list(register_map.expand(modules))
 
-REGISTER_BLOCKS_CIRCUIT_3 = [
-        (5200, 5206), # Heating Circuit 3
-        (5250, 5252), # Heating Circuit 3
+
+SENSORS = expand_sensors(DEFAULT_MODULES)
+
+# Diagnosesensoren zur Abfragestatistik (standardmäßig deaktiviert)
+DIAGNOSTIC_SENSORS = [
+    {"key": "last_cycle_duration", "name": "Modbus Last Cycle Duration", "unit": "ms",
+     "value": lambda stats: None if stats.last_cycle_duration is None else round(stats.last_cycle_duration * 1000, 1)},
+    {"key": "last_decode_duration", "name": "Modbus Last Decode Duration", "unit": "ms",
+     "value": lambda stats: None if stats.last_decode_duration is None else round(stats.last_decode_duration * 1000, 2)},
+    {"key": "errors_per_hour", "name": "Modbus Errors per Hour", "unit": "errors/h",
+     "value": lambda stats: stats.errors_last_hour()},
+    {"key": "reconnects", "name": "Modbus Reconnects", "unit": None, "state_class": "total_increasing",
+     "value": lambda stats: stats.reconnects},
 ]
 
-class ModbusClientManager:
-    """Manage a persistent Modbus TCP client."""
-
-    def __init__(self, ip_address, register_blocks):
-        self.client = ModbusTcpClient(ip_address)
-        self.register_blocks = register_blocks
-        _LOGGER.info("Lambda Heatpump: using pymodbus %s", pymodbus_version)
-
-    def fetch_data(self, sensors):
-        """Fetch data from the Lambda Heatpump using predefined register blocks."""
-        data = {}
-        try:
-            for start_register, end_register in self.register_blocks:
-                count = end_register - start_register + 1
-                _LOGGER.debug(f"Reading registers from {start_register} to {end_register} (count: {count})")
-
-                # Lese die Register im definierten Block
-                #result = self.client.read_holding_registers(start_register, count=count, unit=1)
-                result = self.client.read_holding_registers(start_register, count=count, device_id=1)
-                
-
-
-                #try:
-                  #  result = self.client.read_holding_registers(start_register, count=count, unit=1)
-                #except TypeError:
-                    #result = self.client.read_holding_registers(start_register, count=count, slave=1)
-
-
-
-
-                
-                if result.isError():
-                    _LOGGER.error(f"Error reading registers from {start_register} to {end_register}: {result}")
-                    continue
-
-                # Ordne die gelesenen Werte den Sensoren zu
-                for sensor in sensors:
-                    if isinstance(sensor["register"], list):  # int32
-                        if start_register <= sensor["register"][0] <= end_register:
-                            low  = result.registers[sensor["register"][0] - start_register] & 0xFFFF  # LOW word
-                            high = result.registers[sensor["register"][1] - start_register] & 0xFFFF  # HIGH word
-
-                            # Auto-detect 16-bit vs 32-bit and handle word-order edge cases
-                            # Cases:
-                            #  A) Only LOW has data  -> uint16 (value = low)
-                            #  B) Only HIGH has data -> uint16 (value = high) [typical when lower 16 bits are always 0]
-                            #  C) Both words present -> uint32 (value = (HIGH<<16)|LOW)
-                            #  D) If (C) looks implausible, try swapped fallback.
-
-                            value_16_candidate = None
-                            if low != 0 and high == 0:
-                                value_16_candidate = low
-                            elif high != 0 and low == 0:
-                                value_16_candidate = high
-
-                            if value_16_candidate is not None:
-                                value = value_16_candidate
-                            else:
-                                value = ((high << 16) | low) & 0xFFFFFFFF
-                                swapped = ((low << 16) | high) & 0xFFFFFFFF
-                                if (value & 0xFFFF) == 0 and (swapped & 0xFFFF) != 0 and swapped < value:
-                                    value = swapped
-
-                            scaled_value = value * sensor.get("scale", 1)
-                            data[sensor["name"]] = round(scaled_value, sensor.get("precision", 0))
-                    elif start_register <= sensor["register"] <= end_register:  # int16/uint16
-                        raw_value = result.registers[sensor["register"] - start_register]
-                        if sensor.get("data_type") == "int16":
-                            value = raw_value if raw_value < 0x8000 else raw_value - 0x10000
-                        else:
-                            value = raw_value
-                        scaled_value = value * sensor.get("scale", 1)
-                        data[sensor["name"]] = round(scaled_value, sensor.get("precision", 0))
-
-        except Exception as e:
-            _LOGGER.error(f"Failed to fetch data: {e}")
-            data = {sensor["name"]: None for sensor in sensors}
+# Totband: absolute Mindeständerung für Temperaturen (K), relative für Leistungen und Durchflüsse (%)
+DEFAULT_TEMPERATURE_DEADBAND = 0.2
+DEFAULT_RELATIVE_DEADBAND = 2
+RELATIVE_DEADBAND_UNITS = {"W", "kW", "l/h", "l/min"}
+
+
+def publish_filter(sensor, options):
+    """Return the deadband filter deciding when a sensor writes a new state."""
+    if sensor.get("description_map"):
+        # Textzustände nur bei Zustandswechseln schreiben
+        return DeadbandFilter()
+    absolute = sensor.get("deadband")
+    percent = sensor.get("deadband_percent")
+    if absolute is None and percent is None:
+        if sensor.get("device_class") == "temperature":
+            absolute = options.get(CONF_TEMPERATURE_DEADBAND, DEFAULT_TEMPERATURE_DEADBAND)
+        elif sensor["unit"] in RELATIVE_DEADBAND_UNITS:
+            percent = options.get(CONF_RELATIVE_DEADBAND, DEFAULT_RELATIVE_DEADBAND)
+    return DeadbandFilter(absolute or 0, (percent or 0) / 100, options.get(CONF_HEARTBEAT, DEFAULT_HEARTBEAT) or None)
 
-        return data
 
-    def close(self):
-        """Close the Modbus client."""
-        self.client.close()
+def writable_sensors(sensors):
+    """Return the sensors whose register can be written."""
+    return [sensor for sensor in sensors if "write" in sensor]
+
+
+def sampling_candidates(sensors):
+    """Return the sensors that can be sampled at a high rate (numeric values only)."""
+    return [sensor for sensor in sensors if not sensor.get("description_map")]
+
+
+def sensor_unique_id(entry_id, sensor):
+    """Return the unique ID of a sensor entity, scoped to its config entry."""
+    # int32-Register sind Tupel; die IDs behalten das bisherige Listenformat "<entry_id>_[1020, 1021]",
+    # damit vorhandene Entitäten und ihre Langzeitstatistiken erhalten bleiben
+    register = sensor["register"]
+    return f"{entry_id}_{list(register) if isinstance(register, tuple) else register}"
+
+
+def device_info(entry_id, device_name, model):
+    """Return the device info of a device group of a config entry."""
+    return {
+        "identifiers": {(DOMAIN, f"{entry_id}_{device_name}")},
+        "name": device_name,
+        "manufacturer": "Lambda",
+        "model": model,
+    }
 
 async def async_setup_entry(hass, entry, async_add_entities):
     """Set up Lambda Heatpump sensors."""
     ip_address = entry.data["ip_address"]
-    update_interval = timedelta(seconds=entry.data.get("update_interval", 30))  # Standard: 30 Sekunden
-
-    register_blocks = list(REGISTER_BLOCKS)
-    if entry.data.get("has_heat_circuit_2", True):
-        register_blocks += REGISTER_BLOCKS_CIRCUIT_2
-    if entry.data.get("has_heat_circuit_3", True):
-        register_blocks += REGISTER_BLOCKS_CIRCUIT_3
-
-    client_manager = ModbusClientManager(ip_address, register_blocks)
+    update_interval = timedelta(seconds=entry.data.get(CONF_UPDATE_INTERVAL, 30))  # Standard: 30 Sekunden
+    max_gap = entry.data.get(CONF_MAX_REGISTER_GAP, DEFAULT_MAX_REGISTER_GAP)
+    poll_intervals = {
+        POLL_TIER_FAST: entry.data.get(CONF_FAST_UPDATE_INTERVAL, DEFAULT_POLL_INTERVALS[POLL_TIER_FAST]),
+        POLL_TIER_NORMAL: update_interval.total_seconds(),
+        POLL_TIER_SLOW: entry.data.get(CONF_SLOW_UPDATE_INTERVAL, DEFAULT_POLL_INTERVALS[POLL_TIER_SLOW]),
+    }
+
+    # Sensoren der bei der Einrichtung gefundenen Module; die Registerkarte lädt __init__
+    register_map = hass.data[DOMAIN][entry.entry_id]["register_map"]
+    modules = entry.data.get(CONF_MODULES, DEFAULT_MODULES)
+    sensors = expand_sensors(modules, register_map)
+
+    # Optionaler Mitschnitt der rohen Blockantworten für Fehlersuche und Replay
+    capture = None
+    if entry.options.get(CONF_CAPTURE):
+        capture = CaptureWriter(
+            hass.config.path(CAPTURE_DIRECTORY, f"{entry.entry_id}.bin"),
+            metadata={"register_map": register_map.key, "modules": modules},
+            max_size=entry.options.get(CONF_CAPTURE_MAX_SIZE, DEFAULT_CAPTURE_MAX_SIZE),
+        )
+
+    # Im Entity-Registry deaktivierte Sensoren werden nicht abgefragt
+    registry = er.async_get(hass)
+
+    def is_enabled(sensor):
+        entity_id = registry.async_get_entity_id("sensor", DOMAIN, sensor_unique_id(entry.entry_id, sensor))
+        return entity_id is None or not registry.async_get(entity_id).disabled
+
+    client_manager = ModbusClientManager(
+        ip_address,
+        sensors,
+        max_gap=max_gap,
+        poll_intervals=poll_intervals,
+        max_value_age=entry.data.get(CONF_MAX_VALUE_AGE, DEFAULT_MAX_VALUE_AGE),
+        connection=hass.data[DOMAIN][entry.entry_id]["connection"],
+        capture=capture,
+    )
+    for sensor in sensors:
+        if not is_enabled(sensor):
+            client_manager.set_sensor_enabled(sensor["name"], False)
+
+    # Schreibzugriffe der Number/Select-Entitäten; deren Register werden immer abgefragt
+    write_queue = WriteQueue(hass.data[DOMAIN][entry.entry_id]["connection"], on_written=client_manager.request_read)
+    for sensor in writable_sensors(sensors):
+        client_manager.require_sensor(sensor["name"])
+
+    # Hochfrequent abgetastete Sensoren liest der Sampler statt des regulären Abfragezyklus
+    sampled_names = set(entry.options.get(CONF_SAMPLED_SENSORS, []))
+    sampled = [sensor for sensor in sampling_candidates(sensors) if sensor["name"] in sampled_names and is_enabled(sensor)]
+    sampled_names = {sensor["name"] for sensor in sampled}
+    sampler = None
+    if sampled:
+        sampler = HighRateSampler(
+            hass.data[DOMAIN][entry.entry_id]["connection"],
+            sampled,
+            interval=entry.options.get(CONF_SAMPLING_INTERVAL, DEFAULT_SAMPLING_INTERVAL),
+            max_gap=max_gap,
+        )
+        for sensor in sampled:
+            client_manager.set_sensor_enabled(sensor["name"], False)
+
+    store = snapshot_store(hass, entry.entry_id)
+    snapshot_saved_at = None
+    capture_flush = None
 
     async def async_update_data():
-        """Fetch data from the heat pump."""
-        return client_manager.fetch_data(SENSORS)
+        """Fetch the due poll tiers from the heat pump."""
+        nonlocal snapshot_saved_at, capture_flush
+        data = await client_manager.fetch_data()
+        write_queue.verify()
+        # Nicht warten: ein hängender Datenträger darf die Abfrage nicht aufhalten; solange ein
+        # Schreibvorgang läuft, sammeln sich die Sätze bis zur Obergrenze in CaptureWriter.append
+        if capture is not None and (capture_flush is None or capture_flush.done()):
+            capture_flush = hass.async_add_executor_job(capture.flush)
+        # Der Takt folgt der schnellsten Abfrageklasse, die noch aktive Sensoren hat
+        coordinator.update_interval = timedelta(seconds=client_manager.poll_interval)
+        if data and (snapshot_saved_at is None or time.monotonic() - snapshot_saved_at >= SNAPSHOT_SAVE_INTERVAL):
+            snapshot_saved_at = time.monotonic()
+            store.async_delay_save(lambda: {"data": data}, 0)
+        return data
 
     coordinator = DataUpdateCoordinator(
         hass,
         _LOGGER,
         name="Lambda Heatpump",
         update_method=async_update_data,
-        update_interval=update_interval,
+        update_interval=timedelta(seconds=client_manager.poll_interval),
     )
 
-    await coordinator.async_config_entry_first_refresh()
-
-    # Gruppierung der Sensoren nach Kategorien
-    grouped_sensors = [
-        (sensor, "General Ambient") for sensor in SENSORS[:5]
-    ] + [
-        (sensor, "E-Manager") for sensor in SENSORS[5:10]
-    ] + [
-        (sensor, "Heat Pump No. 1") for sensor in SENSORS[10:31]
-    ] + [
-        (sensor, "Boiler") for sensor in SENSORS[31:36]
-    ] + [
-        (sensor, "Buffer") for sensor in SENSORS[36:41]
-    ] + [
-        # (sensor, "Solar") for sensor in SENSORS[41:46]  # Solar auskommentiert
-    ] + [
-        (sensor, "Heating Circuit 1") for sensor in SENSORS[41:51]
-    ]
+    # Entitäten starten mit den zuletzt gesicherten Werten; die erste Abfrage läuft im
+    # Hintergrund, damit eine belegte oder langsame Steuerung den Start nicht aufhält
+    snapshot = await store.async_load()
+    if snapshot:
+        names = {sensor["name"] for sensor in sensors}
+        coordinator.data = {name: value for name, value in snapshot["data"].items() if name in names}
+        # Auch der Client kennt die Werte, sonst ersetzt eine erste Abfrage ohne Antwort sie durch leere Daten
+        client_manager.restore(coordinator.data)
+    hass.data[DOMAIN][entry.entry_id].update(
+        client_manager=client_manager,
+        coordinator=coordinator,
+        sensors=sensors,
+        write_queue=write_queue,
+    )
+    if capture is not None:
+        hass.data[DOMAIN][entry.entry_id]["capture"] = capture
 
-    # Optionale Heizkreise (basierend auf Konfiguration)
-    if entry.data.get("has_heat_circuit_2", True):
-        grouped_sensors += [(sensor, "Heating Circuit 2") for sensor in SENSORS[51:61]]
+        async def async_close_capture():
+            """Write the remaining records and close the capture file."""
+            await hass.async_add_executor_job(capture.close)
 
-    if entry.data.get("has_heat_circuit_3", True):
-        grouped_sensors += [(sensor, "Heating Circuit 3") for sensor in SENSORS[61:]]
+        entry.async_on_unload(async_close_capture)
+    entry.async_on_unload(write_queue.close)
+    entry.async_create_background_task(hass, write_queue.run(), "lambda_heatpump_write_queue")
 
     # Sensoren erstellen und hinzufügen
-    sensors = [LambdaHeatpumpSensor(coordinator, sensor, device_name) for sensor, device_name in grouped_sensors]
-    async_add_entities(sensors)
-
-    # Schließe den Client beim Entladen der Integration
-    hass.bus.async_listen_once("homeassistant_stop", lambda event: client_manager.close())
-
-class LambdaHeatpumpSensor(Entity):
+    entities = [
+        LambdaHeatpumpSensor(
+            coordinator, client_manager, entry.entry_id, sensor, register_map.model, publish_filter(sensor, entry.options)
+        )
+        for sensor in sensors
+        if sensor["name"] not in sampled_names
+    ]
+    entities += [
+        LambdaHeatpumpDiagnosticSensor(coordinator, client_manager.statistics, entry.entry_id, description, register_map.model)
+        for description in DIAGNOSTIC_SENSORS
+    ]
+    if sampler is not None:
+        sampled_entities = [
+            LambdaHeatpumpSampledSensor(sampler, entry.entry_id, sensor, register_map.model, update_interval)
+            for sensor in sampled
+        ]
+        entities += sampled_entities
+        hass.data[DOMAIN][entry.entry_id].update(
+            sampler=sampler,
+            sampled_sensors={entity.unique_id: entity.sensor_name for entity in sampled_entities},
+        )
+        entry.async_on_unload(sampler.close)
+        entry.async_create_background_task(hass, sampler.run(), "lambda_heatpump_sampler")
+    async_add_entities(entities)
+    entry.async_create_background_task(hass, coordinator.async_refresh(), "lambda_heatpump_first_refresh")
+
+    # Laufende Abfragen beim Entladen beenden; die Verbindung gibt __init__ frei
+    entry.async_on_unload(client_manager.close)
+    entry.async_on_unload(lambda: store.async_save({"data": coordinator.data}) if coordinator.data else None)
+
+class LambdaHeatpumpSensor(CoordinatorEntity, SensorEntity):
     """Representation of a Lambda Heatpump sensor."""
 
-    def __init__(self, coordinator, sensor, device_name):
+    def __init__(self, coordinator, client_manager, entry_id, sensor, model, publish_filter):
         """Initialize the sensor."""
-        self._coordinator = coordinator
-        self._name = sensor["name"]
-        self._register = sensor["register"]
-        self._unit = sensor["unit"]
-        self._scale = sensor.get("scale", 1)
-        self._precision = sensor.get("precision", 0)
-        self._data_type = sensor.get("data_type", "int16")
-        self._device_class = sensor.get("device_class")
-        self._state_class = sensor.get("state_class")
+        super().__init__(coordinator)
+        self._client_manager = client_manager
+        self._publish_filter = publish_filter
+        self._key = sensor["name"]
         self._description_map = sensor.get("description_map")
-        self._device_name = device_name  # Gruppierungsname
-
-    @property
-    def name(self):
-        """Return the name of the sensor."""
-        return self._name
-
-    @property
-    def unique_id(self):
-        """Return a unique ID for the sensor."""
-        return f"lambda_heatpump_{self._register}"
 
-    @property
-    def state(self):
-        """Return the state of the sensor."""
-        raw_value = self._coordinator.data.get(self._name)
+        self._attr_name = sensor["name"]
+        self._attr_unique_id = sensor_unique_id(entry_id, sensor)
+        self._attr_native_unit_of_measurement = sensor["unit"] or None
+        if self._description_map:
+            # Textzustände haben weder Einheit noch Statistik
+            self._attr_device_class = None
+            self._attr_state_class = None
+        else:
+            self._attr_device_class = sensor.get("device_class")
+            self._attr_state_class = sensor.get("state_class")
+        self._attr_device_info = device_info(entry_id, sensor["device"], model)
+        self._attr_native_value = self._decode(coordinator.data)
+        self._last_available = coordinator.last_update_success
+        publish_filter.update(self._attr_native_value, force=True)
+
+    def _decode(self, data):
+        """Translate the coordinator value of this sensor into its entity state."""
+        raw_value = (data or {}).get(self._key)
         if (raw_value is None) or (raw_value == 0x8000):
             return None
         # Verwenden der description_map, falls vorhanden
         if self._description_map:
-            try:
-                return self._description_map[int(raw_value)]
-            except IndexError:
-                return f"Unknown ({raw_value})"
-        # Rückgabe des Werts ohne zusätzliche Skalierung
-        return round(raw_value, self._precision)
+            index = int(raw_value)
+            if 0 <= index < len(self._description_map):
+                return self._description_map[index]
+            return f"Unknown ({raw_value})"
+        return raw_value
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Write the state if availability changed or the value passes the deadband filter."""
+        value = self._decode(self.coordinator.data)
+        available = self.coordinator.last_update_success
+        if not self._publish_filter.update(value, force=available != self._last_available):
+            return
+        self._attr_native_value = value
+        self._last_available = available
+        self.async_write_ha_state()
+
+    async def async_added_to_hass(self):
+        """Include the sensor in the read plan once it is enabled."""
+        await super().async_added_to_hass()
+        self._client_manager.set_sensor_enabled(self._key, True)
+
+    async def async_will_remove_from_hass(self):
+        """Drop the sensor from the read plan when it is disabled or removed."""
+        await super().async_will_remove_from_hass()
+        self._client_manager.set_sensor_enabled(self._key, False)
+
+
+class LambdaHeatpumpDiagnosticSensor(CoordinatorEntity, SensorEntity):
+    """Diagnostic sensor exposing the poll statistics of the Modbus connection."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self, coordinator, statistics, entry_id, description, model):
+        """Initialize the diagnostic sensor."""
+        super().__init__(coordinator)
+        self._statistics = statistics
+        self._value = description["value"]
+        self._attr_name = description["name"]
+        self._attr_unique_id = f"{entry_id}_diagnostic_{description['key']}"
+        self._attr_native_unit_of_measurement = description["unit"]
+        self._attr_state_class = description.get("state_class", "measurement")
+        self._attr_device_info = device_info(entry_id, "Modbus Connection", model)
 
     @property
-    def unit_of_measurement(self):
-        """Return the unit of measurement."""
-        return self._unit
+    def available(self):
+        """Return True, statistics are also meaningful while polling fails."""
+        return True
 
     @property
-    def device_class(self):
-        """Return the device class of the sensor."""
-        return self._device_class
+    def native_value(self):
+        """Return the current statistic."""
+        return self._value(self._statistics)
 
-    @property
-    def state_class(self):
-        """Return the state class of the sensor."""
-        if self.unique_id in [
-            "lambda_heatpump_[1020, 1021]",
-            "lambda_heatpump_[1022, 1023]",
-        ] or self._name in [
-            "Heat Pump 1 Compressor Power Consumption Accumulated",
-            "Heat Pump 1 Compressor Thermal Energy Output Accumulated",
-        ]:
-            _LOGGER.debug(f"Setting state_class to total_increasing for sensor {self._name} (unique_id: {self.unique_id})")
-            return "total_increasing"
-        _LOGGER.debug(f"Using default state_class for sensor {self._name} (unique_id: {self.unique_id})")
-        return self._state_class
 
-    @property
-    def available(self):
-        """Return if entity is available."""
-        return self._coordinator.last_update_success
+class LambdaHeatpumpSampledSensor(SensorEntity):
+    """Sensor sampled at a high rate, publishing the mean of each update interval.
 
-    @property
-    def device_info(self):
-        """Return device information for grouping sensors."""
-        return {
-            "identifiers": {(DOMAIN, self._device_name)},
-            "name": self._device_name,
-            "manufacturer": "Lambda",
-            "model": "Heatpump Eureka-Luft (EU-L)",
-#            "sw_version": "1.2.25",
-#            "icon": icons.get(self._device_name, "mdi:gauge"),  # Standard-Icon, falls keine Übereinstimmung
-        }
-
-    async def async_update(self):
-        """Update the entity."""
-        await self._coordinator.async_request_refresh()
+    Minimum, maximum, last value and the number of samples of the
+    interval are attributes; the raw samples stay in the sampler's ring
+    buffer and can be exported with the ``export_samples`` service.
+    """
+
+    _attr_should_poll = False
+
+    def __init__(self, sampler, entry_id, sensor, model, publish_interval):
+        """Initialize the sampled sensor."""
+        self._sampler = sampler
+        self._publish_interval = publish_interval
+        self._precision = sensor.get("precision", 0)
+        self._published_at = None
+        self.sensor_name = sensor["name"]
+
+        self._attr_name = sensor["name"]
+        self._attr_unique_id = sensor_unique_id(entry_id, sensor)
+        self._attr_native_unit_of_measurement = sensor["unit"] or None
+        self._attr_device_class = sensor.get("device_class")
+        self._attr_state_class = sensor.get("state_class")
+        self._attr_device_info = device_info(entry_id, sensor["device"], model)
+        self._attr_available = False
+
+    async def async_added_to_hass(self):
+        """Publish the aggregate of every update interval."""
+        self.async_on_remove(async_track_time_interval(self.hass, self._async_publish, self._publish_interval))
+
+    @callback
+    def _async_publish(self, now):
+        """Write the aggregate of the samples since the last publish."""
+        since = self._published_at
+        self._published_at = now.timestamp()
+        aggregate = self._sampler.aggregate(self.sensor_name, since)
+        if aggregate is None:
+            if not self._attr_available:
+                return
+            self._attr_available = False
+        else:
+            self._attr_available = True
+            self._attr_native_value = round(aggregate["mean"], self._precision)
+            self._attr_extra_state_attributes = {
+                "min": aggregate["min"],
+                "max": aggregate["max"],
+                "last": aggregate["last"],
+                "samples": aggregate["count"],
+            }
+        self.async_write_ha_state()
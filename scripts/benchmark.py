@@ -0,0 +1,127 @@
+"""Poll-cycle benchmark for ModbusClientManager against the local simulator.
+
+Usage:
+    python scripts/benchmark.py --cycles 50 --latency 0.005 --json results.json
+
+For every scenario the benchmark reports per-cycle wall time, Modbus
+round trips, bytes on the wire and the CPU time spent decoding a full
+cycle. No network or heat pump is needed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from custom_components.lambda_heatpump.lambda_heatpump_api import (  # noqa: E402
+    DEFAULT_MAX_REGISTER_GAP,
+    POLL_TIER_FAST,
+    POLL_TIER_NORMAL,
+    ModbusClientManager,
+    compile_read_plan,
+)
+from custom_components.lambda_heatpump.sensor import SENSORS  # noqa: E402
+
+from lambda_simulator import build_register_map, start_simulator  # noqa: E402
+
+ALL_DUE = {tier: 0 for tier in ("fast", "normal", "slow")}
+
+
+def scenarios():
+    """Return (name, sensors, max_gap) tuples to benchmark."""
+    fast = [sensor for sensor in SENSORS if sensor.get("poll_tier", POLL_TIER_NORMAL) == POLL_TIER_FAST]
+    return [
+        ("full, gap 0", SENSORS, 0),
+        (f"full, gap {DEFAULT_MAX_REGISTER_GAP}", SENSORS, DEFAULT_MAX_REGISTER_GAP),
+        ("full, gap 16", SENSORS, 16),
+        (f"fast tier, gap {DEFAULT_MAX_REGISTER_GAP}", fast, DEFAULT_MAX_REGISTER_GAP),
+    ]
+
+
+def percentile(values, fraction):
+    """Return the given percentile of a list of values."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure_decode(sensors, max_gap, registers, iterations):
+    """Return the CPU seconds needed to decode one full cycle."""
+    plan = compile_read_plan(sensors, max_gap)
+    blocks = [(block, [registers.get(r, 0) for r in range(block.start, block.end + 1)]) for block in plan]
+    data = {}
+    start = time.process_time()
+    for _ in range(iterations):
+        for block, raw in blocks:
+            block.decode(raw, data)
+    return (time.process_time() - start) / iterations
+
+
+async def measure_polling(simulator, port, sensors, max_gap, cycles):
+    """Poll the simulator and return per-cycle statistics."""
+    manager = ModbusClientManager("127.0.0.1", sensors, max_gap=max_gap, poll_intervals=ALL_DUE, port=port)
+    try:
+        await manager.fetch_data()  # Verbindungsaufbau nicht mitmessen
+        simulator.reset_stats()
+        durations = []
+        for _ in range(cycles):
+            start = time.perf_counter()
+            await manager.fetch_data()
+            durations.append(time.perf_counter() - start)
+    finally:
+        manager.close()
+    return {
+        "cycle_mean_ms": statistics.mean(durations) * 1000,
+        "cycle_p95_ms": percentile(durations, 0.95) * 1000,
+        "round_trips": simulator.device.requests / cycles,
+        "registers_read": simulator.device.registers_read / cycles,
+        "bytes_on_wire": (simulator.bytes_received + simulator.bytes_sent) / cycles,
+    }
+
+
+async def run(args):
+    """Run all scenarios and return the results."""
+    simulator = await start_simulator(port=args.port, latency=args.latency, jitter=args.jitter)
+    registers = build_register_map()
+    results = {}
+    try:
+        for name, sensors, max_gap in scenarios():
+            result = await measure_polling(simulator, args.port, sensors, max_gap, args.cycles)
+            result["decode_cpu_us"] = measure_decode(sensors, max_gap, registers, args.decode_iterations) * 1e6
+            results[name] = result
+    finally:
+        await simulator.shutdown()
+    return results
+
+
+def main():
+    """Run the benchmark and print a result table."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=5020)
+    parser.add_argument("--cycles", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated controller latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--decode-iterations", type=int, default=2000)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    header = f"{'scenario':<22}{'mean ms':>10}{'p95 ms':>10}{'requests':>10}{'registers':>11}{'bytes':>9}{'decode us':>11}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(
+            f"{name:<22}{r['cycle_mean_ms']:>10.2f}{r['cycle_p95_ms']:>10.2f}{r['round_trips']:>10.1f}"
+            f"{r['registers_read']:>11.0f}{r['bytes_on_wire']:>9.0f}{r['decode_cpu_us']:>11.1f}"
+        )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Local Lambda heat pump simulator serving the register map of SENSORS.
+
+Usage:
+    python scripts/lambda_simulator.py --port 5020 --latency 0.02 --loss 0.01
+
+Every module (register hundred) that has at least one sensor is served
+completely, so reads through unused registers succeed like on the real
+controller. Registers of omitted modules answer with a Modbus exception.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+
+from pymodbus.datastore import ModbusBaseDeviceContext, ModbusServerContext
+from pymodbus.server import ModbusTcpServer
+from pymodbus.server.requesthandler import ServerRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from custom_components.lambda_heatpump.sensor import SENSORS, expand_sensors  # noqa: E402
+
+_LOGGER = logging.getLogger(__name__)
+
+INVALID_VALUE = 0x8000
+WORD_ORDERS = ("low_high", "high_low")
+
+
+def module_base(register):
+    """Return the first register of the module a register belongs to."""
+    return register // 100 * 100
+
+
+def _raw_value(sensor, rng):
+    """Return a plausible raw 16-bit register value for a sensor."""
+    scale = sensor.get("scale", 1) or 1
+    if sensor.get("description_map"):
+        return rng.randrange(len(sensor["description_map"]))
+    if sensor.get("device_class") == "temperature":
+        value = round(rng.uniform(15, 55) / scale)
+    elif sensor.get("unit") == "W":
+        value = round(rng.uniform(0, 4000) / scale)
+    else:
+        value = round(rng.uniform(0, 100) / scale)
+    return value & 0xFFFF
+
+
+def build_register_map(sensors=SENSORS, word_order="low_high", invalid=(), omit_modules=(), seed=0):
+    """Build the simulated holding registers for a sensor table.
+
+    ``word_order`` controls how int32 counters are stored: ``"low_high"``
+    puts the low word into the first configured register, ``"high_low"``
+    the high word. Registers listed in ``invalid`` report the 0x8000
+    "invalid" sentinel.
+    """
+    rng = random.Random(seed)
+    registers = {}
+    for sensor in sensors:
+        register = sensor["register"]
+        first = sensor.span[0]
+        if module_base(first) in omit_modules:
+            continue
+        for base in range(module_base(first), module_base(first) + 100):
+            registers.setdefault(base, 0)
+        if sensor["data_type"] == "int32":
+            value = rng.randrange(1 << 17, 1 << 28)
+            low, high = value & 0xFFFF, value >> 16
+            words = (low, high) if word_order == "low_high" else (high, low)
+            registers[register[0]], registers[register[1]] = words
+        else:
+            registers[register] = _raw_value(sensor, rng)
+    for register in invalid:
+        if register in registers:
+            registers[register] = INVALID_VALUE
+    return registers
+
+
+class SimulatedLambdaContext(ModbusBaseDeviceContext):
+    """Holding-register store with configurable latency."""
+
+    def __init__(self, registers, latency=0.0, jitter=0.0):
+        self.registers = registers
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self.registers_read = 0
+        self.writes = []
+
+    def reset(self):
+        """Reset the request statistics."""
+        self.requests = 0
+        self.registers_read = 0
+        self.writes = []
+
+    async def _delay(self):
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    async def async_getValues(self, fc_as_hex, address, count=1):
+        """Return ``count`` registers or fail for addresses of missing modules."""
+        self.requests += 1
+        await self._delay()
+        try:
+            values = [self.registers[register] for register in range(address, address + count)]
+        except KeyError as e:
+            raise ValueError(f"illegal data address {e}") from None
+        self.registers_read += count
+        return values
+
+    async def async_setValues(self, fc_as_hex, address, values):
+        """Store written registers."""
+        self.requests += 1
+        await self._delay()
+        for offset, value in enumerate(values):
+            if address + offset not in self.registers:
+                raise ValueError(f"illegal data address {address + offset}")
+            self.registers[address + offset] = value
+        self.writes.append((address, list(values)))
+        return None
+
+
+class _RejectingHandler(ServerRequestHandler):
+    """Connection handler that drops the session right after it was accepted."""
+
+    def callback_connected(self):
+        super().callback_connected()
+        _LOGGER.info("Connection limit reached, closing new session")
+        self.transport.close()
+
+
+class LambdaSimulator(ModbusTcpServer):
+    """Modbus TCP server emulating a Lambda controller.
+
+    ``loss`` is the probability that a response is silently dropped,
+    ``max_connections`` the number of concurrent sessions the controller
+    accepts. Bytes on the wire are counted in ``bytes_received`` and
+    ``bytes_sent``.
+    """
+
+    def __init__(self, context, host="127.0.0.1", port=5020, loss=0.0, max_connections=None):
+        self.device = context
+        self.loss = loss
+        self.max_connections = max_connections
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.dropped = 0
+        super().__init__(
+            ModbusServerContext(devices=context, single=True),
+            address=(host, port),
+            trace_packet=self._trace_packet,
+        )
+
+    def _trace_packet(self, sending, data):
+        if not sending:
+            self.bytes_received += len(data)
+            return data
+        if self.loss and random.random() < self.loss:
+            self.dropped += 1
+            return b""
+        self.bytes_sent += len(data)
+        return data
+
+    def callback_new_connection(self):
+        """Accept a session or reject it once the connection limit is reached."""
+        if self.max_connections is not None and len(self.active_connections) >= self.max_connections:
+            return _RejectingHandler(self, self.trace_packet, self.trace_pdu, self.trace_connect)
+        return super().callback_new_connection()
+
+    def reset_stats(self):
+        """Reset all traffic counters."""
+        self.device.reset()
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.dropped = 0
+
+
+async def start_simulator(
+    host="127.0.0.1",
+    port=5020,
+    latency=0.0,
+    jitter=0.0,
+    loss=0.0,
+    max_connections=None,
+    word_order="low_high",
+    invalid=(),
+    omit_modules=(),
+    sensors=SENSORS,
+):
+    """Start a simulator in the running event loop and return it."""
+    registers = build_register_map(sensors, word_order, invalid, omit_modules)
+    server = LambdaSimulator(
+        SimulatedLambdaContext(registers, latency, jitter),
+        host=host,
+        port=port,
+        loss=loss,
+        max_connections=max_connections,
+    )
+    await server.serve_forever(background=True)
+    return server
+
+
+def main():
+    """Run the simulator until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5020)
+    parser.add_argument("--latency", type=float, default=0.0, help="response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random latency variation in seconds")
+    parser.add_argument("--loss", type=float, default=0.0, help="probability of a dropped response")
+    parser.add_argument("--max-connections", type=int, default=None)
+    parser.add_argument("--word-order", choices=WORD_ORDERS, default="low_high")
+    parser.add_argument("--invalid", type=int, nargs="*", default=(), help="registers reporting 0x8000")
+    parser.add_argument("--omit-module", type=int, nargs="*", default=(), help="module base registers to leave out, e.g. 5200")
+    parser.add_argument("--heat-pumps", type=int, default=1)
+    parser.add_argument("--boilers", type=int, default=1)
+    parser.add_argument("--buffers", type=int, default=1)
+    parser.add_argument("--solar", type=int, default=0)
+    parser.add_argument("--heating-circuits", type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    sensors = expand_sensors({
+        "heat_pump": list(range(1, args.heat_pumps + 1)),
+        "boiler": list(range(1, args.boilers + 1)),
+        "buffer": list(range(1, args.buffers + 1)),
+        "solar": list(range(1, args.solar + 1)),
+        "heating_circuit": list(range(1, args.heating_circuits + 1)),
+    })
+
+    async def run():
+        await start_simulator(
+            args.host, args.port, args.latency, args.jitter, args.loss,
+            args.max_connections, args.word_order, args.invalid, args.omit_module, sensors,
+        )
+        _LOGGER.info("Lambda simulator listening on %s:%s", args.host, args.port)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
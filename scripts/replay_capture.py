@@ -0,0 +1,113 @@
+"""Replay raw register captures through the integration's block decoder.
+
+Usage:
+    python scripts/replay_capture.py config/lambda_heatpump_captures/<entry_id>.bin*
+    python scripts/replay_capture.py capture.bin --sensor "Heat Pump 1 Compressor Power Consumption Accumulated" --raw
+    python scripts/replay_capture.py capture.bin --repeat 20
+
+Rotated files are replayed in the order they were written. Without
+``--sensor`` a summary and the decode throughput are printed; with
+``--sensor`` every decoded value is written as CSV (timestamp, sensor,
+value and with ``--raw`` the raw registers) to stdout, e.g. to debug a
+decoding problem or to backfill statistics. No heat pump is needed.
+"""
+import argparse
+import csv
+from datetime import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from custom_components.lambda_heatpump.capture import CaptureReader, CaptureReplay  # noqa: E402
+from custom_components.lambda_heatpump.register_map import DEFAULT_REGISTER_MAP, load_register_map  # noqa: E402
+from custom_components.lambda_heatpump.sensor import DEFAULT_MODULES  # noqa: E402
+
+
+def open_captures(paths):
+    """Open the capture files, oldest first."""
+    readers = [CaptureReader(path) for path in paths]
+    return sorted(readers, key=lambda reader: reader.metadata.get("created", 0))
+
+
+def replay_for(reader, register_map=None):
+    """Return a replay engine for the register map and modules a file was captured with."""
+    metadata = reader.metadata
+    register_map = load_register_map(register_map or metadata.get("register_map", DEFAULT_REGISTER_MAP))
+    return CaptureReplay(register_map.expand(metadata.get("modules", DEFAULT_MODULES)))
+
+
+def summarize(readers, engines, repeat):
+    """Replay all files ``repeat`` times and print record counts and decode throughput."""
+    durations = []
+    for _ in range(repeat):
+        records = values = 0
+        first = last = None
+        data = {}
+        start = time.perf_counter()
+        for reader, engine in zip(readers, engines):
+            for timestamp, names, _ in engine.replay(reader, data):
+                records += 1
+                values += len(names)
+                first = timestamp if first is None else first
+                last = timestamp
+        durations.append(time.perf_counter() - start)
+
+    print(f"files:    {len(readers)}")
+    print(f"records:  {records} ({values} values)")
+    if first is not None:
+        print(f"captured: {datetime.fromtimestamp(first)} - {datetime.fromtimestamp(last)}")
+    blocks = sorted({block for engine in engines for block in engine.blocks})
+    print(f"blocks:   {', '.join(f'{start}-{start + count - 1}' for start, count in blocks)}")
+    best = min(durations)
+    if records and best:
+        print(f"decode:   {best * 1000:.2f} ms best of {repeat}, {records / best:,.0f} records/s, {best / records * 1e6:.2f} us/record")
+
+
+def export_csv(readers, engines, names, raw):
+    """Write the decoded values of the selected sensors as CSV to stdout."""
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["timestamp", "sensor", "value"] + (["raw"] if raw else []))
+    data = {}
+    for reader, engine in zip(readers, engines):
+        spans = {sensor["name"]: sensor.span for sensor in engine.sensors if sensor["name"] in names}
+        for timestamp, start, count, offset in reader.records():
+            decoder = engine.decoder(start, count)
+            selected = [name for name in decoder.names if name in spans]
+            if not selected:
+                continue
+            registers = reader.registers(offset, count)
+            decoder.decode(registers, data)
+            for name in selected:
+                row = [f"{timestamp:.3f}", name, data[name]]
+                if raw:
+                    first, last = spans[name]
+                    row.append(" ".join(f"0x{word:04x}" for word in registers[first - start:last - start + 1]))
+                writer.writerow(row)
+
+
+def main():
+    """Replay the given capture files."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="capture files, rotated files included")
+    parser.add_argument("--register-map", help="decode with this register map instead of the captured one")
+    parser.add_argument("--sensor", action="append", default=[], help="export this sensor as CSV (repeatable)")
+    parser.add_argument("--raw", action="store_true", help="add the raw registers to the CSV export")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the files this many times for benchmarking")
+    args = parser.parse_args()
+
+    readers = open_captures(args.paths)
+    try:
+        engines = [replay_for(reader, args.register_map) for reader in readers]
+        if args.sensor:
+            export_csv(readers, engines, set(args.sensor), args.raw)
+        else:
+            summarize(readers, engines, args.repeat)
+    finally:
+        for reader in readers:
+            reader.close()
+
+
+if __name__ == "__main__":
+    main()